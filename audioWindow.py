@@ -7,6 +7,8 @@ import numpy as np
 import scipy.signal as sps
 import sounddevice as sd
 
+from dsp import makeTimes
+
 #%% Target for smoothness up to 50kHz sample rate.
 # This should cover the typical sample rates of 44.1k to 48k.
 
@@ -35,7 +37,7 @@ class AudioWindow(QMainWindow):
         # TODO: fix padding so that specgram can be performed
         self.fs = fs
         print(self.fs)
-        self.timevec = np.arange(self.slicedData.size) / self.fs # pre-generate time
+        self.timevec = makeTimes(self.slicedData.size, self.fs) # pre-generate time
 
         # And also the spectrogram form
         print("Pre-calcing specgram")
@@ -180,7 +182,7 @@ class AudioWindow(QMainWindow):
 
     def plot(self):
         # Plot just like in signalView, but no need to downsample
-        self.topPlotItem = self.topPlot.plot(np.arange(self.slicedData.size)/self.fs, self.slicedData) # and no need to abs
+        self.topPlotItem = self.topPlot.plot(self.timevec, self.slicedData) # and no need to abs
         # self.topPlotItem = self.topPlot.plot(
         #     self.timevec[self.extent[0]:self.extent[1]],
         #     self.slicedData[self.extent[0]:self.extent[1]]) # Plot 20 seconds only
@@ -282,7 +284,7 @@ class AudioWindow(QMainWindow):
         # Replot (this is surprisingly good enough, without caching)
         if self.topPlotItem is not None:
             self.topPlotItem.setData(
-                np.arange(0,self.slicedData.size,self.pltDsr) / self.fs,
+                self.timevec[::self.pltDsr],
                 self.slicedData[::self.pltDsr]
             )
 
@@ -4,6 +4,7 @@ from PySide6.QtCore import Qt, Signal, Slot, QRectF
 import pyqtgraph as pg
 import numpy as np
 import scipy.signal as sps
+import scipy.fft
 from dsp import *
 
 class EstimateFreqWindow(QMainWindow):
@@ -83,7 +84,7 @@ class EstimateFreqWindow(QMainWindow):
         # Initialize FFT plot
         self.odata = None # Some placeholders
         self.f = None
-        self.ffreq =  np.fft.fftfreq(self.slicedData.size, 1/self.fs)
+        self.ffreq = makeFreq(self.slicedData.size, self.fs)
         self.replotFFT()
 
         # Link order changes to replot
@@ -112,7 +113,7 @@ class EstimateFreqWindow(QMainWindow):
     @Slot()
     def replotFFT(self):
         self.odata = self.calculateCM()
-        self.f = np.fft.fft(self.odata)
+        self.f = scipy.fft.fft(self.odata) # Stays in single precision
         
         self.fftplotItem.setData(
             np.fft.fftshift(self.ffreq),
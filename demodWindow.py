@@ -7,7 +7,7 @@ import numpy as np
 import scipy.signal as sps
 from functools import partial
 
-from dsp import makeFreq, SimpleDemodulatorBPSK, SimpleDemodulatorQPSK, SimpleDemodulator8PSK, SimpleDemodulatorPSK
+from dsp import makeFreq, makeTimes, SimpleDemodulatorBPSK, SimpleDemodulatorQPSK, SimpleDemodulator8PSK, SimpleDemodulatorPSK
 
 
 class DemodWindow(QMainWindow):
@@ -89,7 +89,7 @@ class DemodWindow(QMainWindow):
 
         self.absplt = self.abswin.addPlot()
         self.abspltitem = self.absplt.plot(
-            np.arange(self.slicedData.size)/self.fs, np.abs(self.slicedData))
+            makeTimes(self.slicedData.size, self.fs), np.abs(self.slicedData))
 
         # ==== Vertical middle layout
         # Left: the eye opening plot, right: the constellation plot
@@ -215,7 +215,7 @@ class DemodWindow(QMainWindow):
         if resampled.size % self.osr != 0:
             resampled = resampled[:-(resampled.size % self.osr)]
         self.demodulator.demod(resampled.astype(
-            np.complex64), self.osr, verb=False)
+            np.complex64, copy=False), self.osr, verb=False)
 
         # Plot the eye-opening
         self.eoplt.clear()  # Clear plot for re-runs
@@ -7,16 +7,369 @@ Also, some methods may have variations from the original versions.
 import numpy as np
 import scipy as sp
 import scipy.signal as sps
+import scipy.fft
 import warnings
 
+FFT_BATCH = 1 << 15 # Samples transformed at a time in averagedSpectrogram(), so the batch stays in cache
+
+# Spectrogram power histograms, in bins of dB, per group of columns (see powerHistogram())
+HIST_DB_MIN = -300.0
+HIST_DB_STEP = 0.25
+HIST_BINS = 2000
+HIST_GROUP_COLUMNS = 256
+
+# FIR filters with more taps than this per output computed use overlap-save FFT convolution
+OLS_TAPS_PER_OUTPUT = 8
+OLS_MIN_FFT = 4096
+
 def makeFreq(length, fs):
-    freq = np.zeros(length)
-    for i in range(length):
-        freq[i] = i/length * fs
-        if freq[i] >= fs/2:
-            freq[i] = freq[i] - fs
+    '''Same as np.fft.fftfreq(length, 1/fs), in float32.'''
+    freq = np.arange(length, dtype=np.float32)
+    freq[(length + 1) // 2:] -= length
+    freq *= np.float32(fs / length)
     return freq
 
+def makeTimes(length, fs, step=1):
+    '''
+    Times of every step-th of length samples at fs, from 0 (for plotting a slice).
+    These stay float64, since float32 can't tell apart indices past 2**24;
+    they are only as long as the slice, not the capture.
+    '''
+    return np.arange(0, length, step) / fs
+
+def stftWindow(x, fs: float, window, nperseg: int, shift: bool=False):
+    """
+    Window for segmentPowers(), with the 'density' scaling of scipy.signal.spectrogram() folded in.
+    If shift is set (and x is complex), it also modulates the segments by half the sample rate,
+    which makes the FFT come out already fftshifted.
+
+    Returns
+    -------
+    win : np.ndarray
+        Window in the precision of x; complex for an odd nperseg with shift.
+    onesided : bool
+        True for real x, which only has the non-negative frequencies computed.
+    """
+    onesided = not np.iscomplexobj(x)
+    win = sps.get_window(window, nperseg)
+    win = win / np.sqrt(fs * np.sum(win * win))
+    if shift and not onesided:
+        n = np.arange(nperseg)
+        win = win * ((-1.0)**n if nperseg % 2 == 0 else np.exp(2j * np.pi * (nperseg // 2) * n / nperseg))
+    # The window is float64 from scipy, so pick its precision from x alone (or frames * win would upcast)
+    if x.dtype in (np.complex64, np.float32):
+        dtype = np.complex64 if np.iscomplexobj(win) else np.float32
+    else:
+        dtype = np.complex128 if np.iscomplexobj(win) else np.float64
+    return win.astype(dtype), onesided
+
+def segmentPowers(block: np.ndarray, win: np.ndarray, hop: int, onesided: bool, workers: int=-1):
+    """
+    Power spectra of the segments of block that start every hop samples, as
+    scipy.signal.spectrogram() would compute them (with detrend=False).
+    The FFTs are batched and split across workers threads (all cores by default).
+
+    Returns
+    -------
+    power : np.ndarray
+        Array of shape (number of segments, number of frequencies).
+    """
+    frames = np.lib.stride_tricks.sliding_window_view(block, win.size)[::hop]
+    if onesided:
+        spec = scipy.fft.rfft(frames * win, axis=1, workers=workers)
+    else:
+        spec = scipy.fft.fft(frames * win, axis=1, workers=workers)
+    power = np.square(spec.real)
+    power += np.square(spec.imag)
+    if onesided:
+        # Both halves of the spectrum are in the positive frequencies
+        power[:, 1:None if win.size % 2 else -1] *= 2
+    return power
+
+def averagedSpectrogram(
+    x, fs: float, window, nperseg: int, noverlap: int, segsPerCol: int,
+    seg0: int=0, seg1: int=None, maxHold: bool=False, shift: bool=False,
+    segsPerBlock: int=4096, workers: int=-1, callback=None
+):
+    '''
+    Spectrogram over segments seg0 to seg1 (all by default) of x, where segment k is the nperseg
+    samples from k * (nperseg - noverlap), and each column is the average power of segsPerCol
+    consecutive segments (or their maximum, with maxHold); the last column takes whatever is left.
+    With segsPerCol=1 the columns are the same as those of scipy.signal.spectrogram(x, fs, window,
+    nperseg, noverlap, return_onesided=False, detrend=False), scaled as a 'density'.
+    Real x (e.g. from a .wav) gets a one-sided spectrogram.
+
+    Only one block of x is sliced at a time, and it is transformed in batches of about FFT_BATCH
+    samples, with the FFTs split across workers threads (see segmentPowers()). If provided, callback(segmentsDone, totalSegments)
+    is called after every block. Columns are finished (and their min/max taken) as soon as their
+    last block is in, so the output is only written once and never copied.
+
+    Returns
+    -------
+    freqs : np.ndarray
+        Frequency vector, as from scipy; fftshifted if shift is set.
+    ts : np.ndarray
+        Column centre times, on a uniform grid of segsPerCol segments.
+    sxx : np.ndarray
+        float32 spectrogram matrix of shape (number of frequencies, number of columns);
+        its rows are fftshifted if shift is set.
+    sxxMin : float
+        Minimum of sxx.
+    sxxMax : float
+        Maximum of sxx.
+    '''
+    hop = int(nperseg - noverlap)
+    numSegs = (x.size - nperseg) // hop + 1 if x.size >= nperseg else 0
+    seg1 = numSegs if seg1 is None else min(seg1, numSegs)
+    numCols = max(-(-(seg1 - seg0) // segsPerCol), 0)
+    counts = np.full(numCols, segsPerCol)
+    if numCols > 0:
+        counts[-1] = (seg1 - seg0) - (numCols - 1) * segsPerCol
+
+    win, onesided = stftWindow(x, fs, window, nperseg, shift)
+    if onesided:
+        freqs = np.fft.rfftfreq(nperseg, 1/fs)
+    else:
+        freqs = np.fft.fftfreq(nperseg, 1/fs)
+        if shift:
+            freqs = np.fft.fftshift(freqs)
+
+    sxx = np.zeros((freqs.size, numCols), dtype=np.float32) # Powers are >= 0, so this also starts the max-hold
+    sxxMin, sxxMax = np.inf, -np.inf
+    done = 0 # Columns that are finished
+    batch = max(FFT_BATCH // nperseg, 1)
+    for k0 in range(seg0, seg1, segsPerBlock):
+        k1 = min(k0 + segsPerBlock, seg1)
+        block = x[k0*hop : (k1-1)*hop + nperseg]
+
+        for b0 in range(k0, k1, batch):
+            b1 = min(b0 + batch, k1)
+            power = segmentPowers(block[(b0-k0)*hop : (b1-1-k0)*hop + nperseg], win, hop, onesided, workers)
+
+            # Combine the segments into their columns; a column may be split across batches
+            cols = (np.arange(b0, b1) - seg0) // segsPerCol
+            firsts = np.flatnonzero(np.diff(cols, prepend=-1))
+            if segsPerCol == 1:
+                sxx[:, cols[0]:cols[-1]+1] = power.T
+            elif maxHold:
+                sxx[:, cols[firsts]] = np.maximum(sxx[:, cols[firsts]], np.maximum.reduceat(power, firsts, axis=0).T)
+            else:
+                sxx[:, cols[firsts]] += np.add.reduceat(power, firsts, axis=0).T
+
+            # Finish the columns that are complete while they are still in cache
+            complete = numCols if b1 == seg1 else (b1 - seg0) // segsPerCol
+            if complete > done:
+                finished = sxx[:, done:complete]
+                if not maxHold and segsPerCol > 1:
+                    finished /= counts[done:complete]
+                sxxMin = min(sxxMin, float(finished.min()))
+                sxxMax = max(sxxMax, float(finished.max()))
+                done = complete
+
+        if callback is not None:
+            callback(k1 - seg0, seg1 - seg0)
+
+    ts = ((seg0 + np.arange(numCols) * segsPerCol + (segsPerCol - 1)/2) * hop + nperseg/2) / fs
+
+    return freqs, ts, sxx, sxxMin, sxxMax
+
+def budgetedSegsPerCol(numSegs: int, numFreqs: int, maxBytes: int):
+    '''Smallest power of 2 segments per column that keeps a float32 spectrogram of numSegs segments within maxBytes.'''
+    maxCols = max(maxBytes // (numFreqs * np.dtype(np.float32).itemsize), 1)
+    segsPerCol = 1
+    while numSegs > segsPerCol * maxCols:
+        segsPerCol *= 2
+    return segsPerCol
+
+def powerHistogram(sxx: np.ndarray, col0: int=0):
+    """
+    Histograms of the power (in dB) in the columns of sxx, which start at column col0 of
+    a larger spectrogram, for each group of HIST_GROUP_COLUMNS columns of it that they touch.
+    Powers outside the bins are counted in the first or last one.
+
+    Returns
+    -------
+    g0 : int
+        First group.
+    counts : np.ndarray
+        Array of shape (number of groups, HIST_BINS).
+    """
+    with np.errstate(divide='ignore'):
+        bins = np.log10(sxx, dtype=np.float32)
+    bins *= 10 / HIST_DB_STEP
+    bins -= HIST_DB_MIN / HIST_DB_STEP
+    np.clip(bins, 0, HIST_BINS - 1, out=bins)
+    groups = (col0 + np.arange(sxx.shape[1])) // HIST_GROUP_COLUMNS
+    g0 = col0 // HIST_GROUP_COLUMNS
+    flat = bins.astype(np.int64)
+    flat += (groups - g0) * HIST_BINS
+    numGroups = groups[-1] - g0 + 1 if groups.size > 0 else 0
+    counts = np.bincount(flat.reshape(-1), minlength=numGroups * HIST_BINS)
+    return g0, counts.reshape((numGroups, HIST_BINS))
+
+def histogramPercentile(hist: np.ndarray, q: float):
+    '''Power at fraction q (0 to 1) of the way through a histogram from powerHistogram(), summed over its groups.'''
+    cdf = np.cumsum(hist.reshape((-1, HIST_BINS)).sum(axis=0))
+    idx = np.searchsorted(cdf, max(q * cdf[-1], 1))
+    return 10**((HIST_DB_MIN + (min(idx, HIST_BINS - 1) + 0.5) * HIST_DB_STEP) / 10)
+
+def movingAverages(x, lengths: list, chunk: int=1<<22, callback=None):
+    '''
+    Moving averages of |x| for several window lengths, identical to
+    np.convolve(np.ones(L)/L, np.abs(x), 'same') for each length L, but O(N) whatever the lengths.
+
+    All lengths share one pass over x, which is sliced a chunk at a time (so this works on
+    VirtualSampleArray), using running sums of the amplitude. If provided, callback(samplesDone, totalSamples)
+    is called after every chunk.
+
+    Returns
+    -------
+    smas : dict
+        Length -> float32 array of the same size as x.
+    '''
+    n = x.size
+    lengths = sorted(set(lengths))
+    smas = {length: np.empty(n, dtype=np.float32) for length in lengths}
+    # Output i averages |x[i + ahead + 1 - L : i + ahead + 1]| (zero outside x), which is the difference
+    # of the running sums at either end; only the last L of them are needed for the next chunk
+    ahead = {length: (length - 1) // 2 for length in lengths}
+    keep = max(lengths, default=1)
+    done = dict.fromkeys(lengths, 0)
+    sums = np.zeros(1) # Running sums of |x| before samples q0 to p0 (inclusive)
+    q0 = 0
+    for p0 in range(0, n, chunk):
+        p1 = min(p0 + chunk, n)
+        amp = np.abs(x[p0:p1]) # float32 for complex64 samples
+        sums = np.concatenate((sums, sums[-1] + np.cumsum(amp, dtype=np.float64)))
+
+        for length in lengths:
+            i0 = done[length]
+            i1 = n if p1 == n else max(p1 - ahead[length], i0)
+            hi0, hi1 = i0 + ahead[length] + 1, i1 + ahead[length] + 1
+            if hi0 - length >= 0 and hi1 <= n:
+                windowSums = sums[hi0-q0:hi1-q0] - sums[hi0-length-q0:hi1-length-q0]
+            else:
+                # Windows that hang over either end of x
+                hi = np.arange(hi0, hi1)
+                windowSums = sums[np.minimum(hi, n) - q0] - sums[np.maximum(hi - length, 0) - q0]
+            np.multiply(windowSums, 1 / length, out=smas[length][i0:i1], casting='same_kind')
+            done[length] = i1
+
+        q0 += max(sums.size - keep, 0)
+        sums = sums[-keep:]
+        if callback is not None:
+            callback(p1, n)
+    return smas
+
+def overlapSave(buf: np.ndarray, taps: np.ndarray, workers: int=-1):
+    '''
+    Same as np.convolve(buf, taps, 'valid'), by overlap-save FFT convolution: buf is cut into
+    overlapping blocks of an FFT length of about 8 times the taps, which are transformed
+    in one batch split across workers threads (all cores by default).
+    '''
+    T = taps.size
+    numOut = buf.size - T + 1
+    if numOut <= 0:
+        return np.zeros(0, dtype=np.result_type(buf, taps))
+    fftLen = max(1 << int(np.ceil(np.log2(8 * T))), OLS_MIN_FFT)
+    step = fftLen - (T - 1) # New outputs per block
+    numBlocks = -(-numOut // step)
+    padded = np.zeros((numBlocks - 1) * step + fftLen, dtype=np.result_type(buf, taps, np.complex64))
+    padded[:buf.size] = buf
+    blocks = np.lib.stride_tricks.sliding_window_view(padded, fftLen)[::step]
+    spec = scipy.fft.fft(blocks, axis=1, workers=workers)
+    spec *= scipy.fft.fft(taps, fftLen).astype(spec.dtype)
+    out = scipy.fft.ifft(spec, axis=1, workers=workers, overwrite_x=True)
+    # The first T-1 outputs of each block wrap around, and are the ones the block overlaps with
+    return out[:, T-1:].reshape(-1)[:numOut]
+
+class DownConverter:
+    '''
+    Streaming digital down-conversion: a frequency shift, an FIR filter and downsampling, fused
+    into one stage that is fed consecutive blocks of samples. The output is identical to
+    shifting by np.exp(1j*2*np.pi*freqshift*np.arange(N)/fs), then sps.lfilter(taps, 1, ...),
+    then [::dsr] over the whole input, but in complex64 and with work that scales with the output:
+
+    - the tone comes from an NCO whose phase follows from the absolute sample index, so it is continuous between blocks;
+    - short filters are split into dsr polyphase branches, so only the samples that are kept are computed;
+      long ones (over OLS_TAPS_PER_OUTPUT taps per kept sample) use overlap-save FFT convolution instead;
+      either way the last taps.size-1 inputs are carried over as the filter state;
+    - without a filter, only the samples that are kept are read and shifted at all.
+
+    It can also start part way through the input (see seek()), reading back only the filter state,
+    and gives the same outputs from there as it would have after processing everything before it.
+    '''
+
+    def __init__(self, fs: float, freqshift: float = None, taps: np.ndarray = None, dsr: int = 1, workers: int = -1):
+        self.dsr = dsr
+        self.workers = workers
+        self.phaseStep = None if freqshift is None else 2 * np.pi * freqshift / fs
+        self.taps = None if taps is None else np.asarray(taps, dtype=np.float32)
+        self.history = None if taps is None else np.zeros(self.taps.size - 1, dtype=np.complex64)
+        self.consumed = 0 # Index of the next input sample; every dsr-th from 0 is kept
+
+    def outputSize(self, inputSize: int):
+        return len(range(0, inputSize, self.dsr))
+
+    def nco(self, n: np.ndarray):
+        '''Tone at input samples n.'''
+        angles = np.mod(self.phaseStep * n, 2 * np.pi).astype(np.float32)
+        tone = np.empty(n.size, dtype=np.complex64)
+        tone.real = np.cos(angles)
+        tone.imag = np.sin(angles)
+        return tone
+
+    def seek(self, x, i: int):
+        '''Moves to input sample i of x, as if x[:i] had already been processed, reading only the taps.size-1 inputs before it.'''
+        self.consumed = i
+        if self.taps is not None:
+            h0 = max(i - self.history.size, 0)
+            block = np.asarray(x[h0:i], dtype=np.complex64)
+            if self.phaseStep is not None:
+                block = block * self.nco(np.arange(h0, i))
+            self.history = np.concatenate((np.zeros(self.history.size - block.size, dtype=np.complex64), block))
+
+    def process(self, x, i0: int, i1: int):
+        '''Outputs kept from input samples x[i0:i1], which must follow on from the previous call.'''
+        first = -self.consumed % self.dsr # First input of the block on the downsampling grid
+        n = i1 - i0
+        if self.taps is None:
+            out = np.asarray(x[i0 + first:i1:self.dsr], dtype=np.complex64)
+            if self.phaseStep is not None:
+                out = out * self.nco(np.arange(self.consumed + first, self.consumed + n, self.dsr))
+        else:
+            block = np.asarray(x[i0:i1], dtype=np.complex64)
+            if self.phaseStep is not None:
+                block = block * self.nco(np.arange(self.consumed, self.consumed + n))
+            buf = np.concatenate((self.history, block))
+            out = self.decimate(buf, first)
+            self.history = buf[buf.size - self.history.size:]
+
+        self.consumed += n
+        return out
+
+    def decimate(self, buf: np.ndarray, first: int):
+        """
+        Filters buf (the carried state followed by the block) at every dsr-th sample of the block,
+        starting at first. Directly, output k takes taps[p + j*dsr] * buf[first + taps.size-1 + k*dsr - p - j*dsr],
+        so each branch p is a short convolution over every dsr-th sample.
+        """
+        D = self.dsr
+        T = self.taps.size
+        if T > OLS_TAPS_PER_OUTPUT * D:
+            return overlapSave(buf, self.taps, self.workers)[first::D].astype(np.complex64, copy=False)
+
+        numOut = len(range(first, buf.size - (T - 1), D))
+        out = np.zeros(numOut, dtype=np.complex64)
+        if numOut == 0:
+            return out
+        for p in range(min(D, T)):
+            branch = self.taps[p::D]
+            start = first + T - 1 - p - (branch.size - 1) * D
+            seg = buf[start::D][:numOut + branch.size - 1]
+            out += np.convolve(seg, branch, 'valid')
+        return out
+
 def estimateBaud(x: np.ndarray, fs: float):
     '''
     Estimates baud rate of signal. (CM21)
@@ -44,7 +397,7 @@ def estimateBaud(x: np.ndarray, fs: float):
         freq vector (fft shifted) to apply the indices idx1 and idx2 to directly.
 
     '''
-    Xf = np.fft.fftshift(np.fft.fft(np.abs(x)))
+    Xf = np.fft.fftshift(scipy.fft.fft(np.abs(x))) # Stays in single precision
     Xfabs = np.abs(Xf)
     freq = np.fft.fftshift(makeFreq(x.size, fs))
     # Find the peaks
@@ -3,6 +3,7 @@ from PySide6.QtWidgets import QFormLayout, QLineEdit, QCheckBox, QPushButton
 from PySide6.QtCore import Qt, Signal, Slot, QRectF
 import pyqtgraph as pg
 import numpy as np
+import scipy.fft
 from dsp import *
 
 class EstimateBaudWindow(QMainWindow):
@@ -17,7 +18,7 @@ class EstimateBaudWindow(QMainWindow):
         self.filtered = None
 
         # Calculate plain fft
-        self.datafft = np.fft.fft(self.slicedData, 65536) # TODO: make fft len variable
+        self.datafft = scipy.fft.fft(self.slicedData, 65536) # TODO: make fft len variable
 
         # And processed fft
         self.filteredfft = None
@@ -141,15 +142,15 @@ class EstimateBaudWindow(QMainWindow):
                 (region[1]-region[0])/self.fs
             )
 
-            freqshift = np.exp(1j*2*np.pi*-np.mean(region)*np.arange(self.slicedData.size)/self.fs)
-
-            self.filtered = sps.lfilter(ftap,1,self.slicedData*freqshift)
+            # Shift the region down to 0 and filter it in one pass (overlap-save for long filters)
+            ddc = DownConverter(self.fs, -np.mean(region), ftap)
+            self.filtered = ddc.process(self.slicedData, 0, self.slicedData.size)
 
         else:
             self.filtered = np.copy(self.slicedData)
 
         # Create fft of it
-        self.filteredfft = np.fft.fft(self.filtered, 65536) # TODO: make fft len variable
+        self.filteredfft = scipy.fft.fft(self.filtered, 65536) # TODO: make fft len variable
 
         # Replot the filtered version
         self.leftplot()
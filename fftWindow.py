@@ -3,6 +3,7 @@ from PySide6.QtCore import Qt, Signal, Slot, QRectF
 import pyqtgraph as pg
 import numpy as np
 import scipy.signal as sps
+import scipy.fft
 
 from dsp import makeFreq
 
@@ -72,10 +73,12 @@ class FFTWindow(QMainWindow):
         self.plot_medfilt() # We must call this too otherwise the medfilt will be wrong
 
     def plot(self):
-        self.fftData = np.fft.fft(self.slicedData, int(self.fftlenDropdown.currentText()))
+        # scipy keeps complex64 in single precision (np.fft promotes it to complex128)
+        self.fftData = scipy.fft.fft(self.slicedData, int(self.fftlenDropdown.currentText()))
         self.fftData = np.fft.fftshift(self.fftData)
+        self.fftFreq = np.fft.fftshift(makeFreq(int(self.fftlenDropdown.currentText()), self.fs))
         self.plt.setData(
-            x=np.fft.fftshift(makeFreq(int(self.fftlenDropdown.currentText()), self.fs)),
+            x=self.fftFreq,
             y=20*np.log10(np.abs(self.fftData)))
         
     @Slot()
@@ -94,7 +97,7 @@ class FFTWindow(QMainWindow):
                 kernel_size=int(self.fftmedfiltDropdown.currentText())
             )
             self.pltmed.setData(
-                x=np.fft.fftshift(makeFreq(int(self.fftlenDropdown.currentText()), self.fs)),
+                x=self.fftFreq,
                 y=20*np.log10(self.medfiltData),
                 pen='r'
             )
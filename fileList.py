@@ -1,6 +1,7 @@
 from PySide6.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QPushButton, QFileDialog
-from PySide6.QtWidgets import QListWidget, QListWidgetItem, QAbstractItemView, QLineEdit, QMessageBox
-from PySide6.QtCore import Qt, Signal, Slot, QEvent
+from PySide6.QtWidgets import QListWidget, QListWidgetItem, QAbstractItemView, QLineEdit, QMessageBox, QProgressBar
+from PySide6.QtWidgets import QMenu, QProgressDialog
+from PySide6.QtCore import Qt, Signal, Slot, QEvent, QThread
 from PySide6.QtGui import QColor, QBrush, QShortcut, QKeySequence
 import os
 import numpy as np
@@ -8,6 +9,9 @@ import scipy.io as sio
 import sqlite3 as sq
 import operator
 
+from sampleLoader import openMemmaps, readSamples, readRawSamples, VirtualSampleArray, LoadCancelled
+from statsdb import FileStatsDB
+
 # %%
 
 
@@ -18,9 +22,11 @@ class FileListItem(QListWidgetItem):
 
 # %%
 class FileListFrame(QFrame):
-    dataSignal = Signal(np.ndarray, list, list)
+    dataSignal = Signal(object, list, list, dict)
     # sampleRateSignal = Signal(int)
     newFilesSignal = Signal(str, int, list)
+    followSignal = Signal(str, dict)
+    stopFollowSignal = Signal()
     fileListStatusTip = Signal(str)
 
     def __init__(self, db, parent=None, f=Qt.WindowFlags()):
@@ -37,6 +43,8 @@ class FileListFrame(QFrame):
         self.flw.setSelectionMode(QAbstractItemView.ExtendedSelection)
         self.flw.setDragEnabled(True)
         self.flw.setSortingEnabled(True)
+        self.flw.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.flw.customContextMenuRequested.connect(self.onFileListContextMenu)
 
         # Create the ordering list widget
         self.ow = QListWidget()
@@ -66,17 +74,31 @@ class FileListFrame(QFrame):
         self.prepareFolderBtn()
         self.prepareClearBtn()
         self.prepareAddBtn()
+        self.prepareFollowBtn()
 
         # Create a searchbar
         self.searchEdit = QLineEdit()
         self.searchEdit.setPlaceholderText("Filter files..")
         self.searchEdit.textEdited.connect(self.filterFiles)
 
+        # Create the loading progress widgets (only shown while loading)
+        self.loadProgressLayout = QHBoxLayout()
+        self.loadProgressBar = QProgressBar()
+        self.loadProgressBar.setRange(0, 100)
+        self.loadCancelBtn = QPushButton("Cancel")
+        self.loadCancelBtn.clicked.connect(self.cancelLoading)
+        self.loadProgressLayout.addWidget(self.loadProgressBar)
+        self.loadProgressLayout.addWidget(self.loadCancelBtn)
+        self.loadProgressBar.hide()
+        self.loadCancelBtn.hide()
+        self.loadWorker = None
+
         # Create the main layout
         self.layout = QVBoxLayout()
         self.layout.addLayout(self.btnLayout)  # Buttons at the top
         self.layout.addWidget(self.searchEdit)
         self.layout.addLayout(self.hlayout)
+        self.layout.addLayout(self.loadProgressLayout)
         # self.layout.addWidget(self.flw) # List below it
         self.setLayout(self.layout)
 
@@ -97,11 +119,6 @@ class FileListFrame(QFrame):
         # Allow double-click for opening of single files
         self.flw.itemDoubleClicked.connect(self.doubleClickOpen)
 
-        # Initialize database for the filelist cache
-        self.db = db  # Sqlite3 connection object
-        self.initFileListDBCache()
-        self.refreshFileListFromDBCache()
-
         # File settings
         self.fmt = np.int16
         self.swapEndian = False
@@ -110,6 +127,14 @@ class FileListFrame(QFrame):
         self.fixedlen = -1
         self.invSpec = False
         self.sampleStart = 0
+        self.useMemmap = False
+        self.keepNative = True
+
+        # Initialize database for the filelist cache (after the file settings, which the tooltips use)
+        self.db = db  # Sqlite3 connection object
+        self.statsdb = FileStatsDB()  # Per-file statistics, also in cache.db
+        self.initFileListDBCache()
+        self.refreshFileListFromDBCache()
 
     ####################
     @Slot(QListWidgetItem)
@@ -169,6 +194,95 @@ class FileListFrame(QFrame):
             else:
                 self.flw.item(i).setForeground(Qt.black)
 
+    ####################
+    def getStatsSettings(self):
+        return self.fmt, self.headersize, self.swapEndian, self.invSpec
+
+    def formatToolTip(self, size: int, stats: dict = None):
+        tip = "Size: %d bytes" % (size)
+        if stats is not None:
+            tip += "\nSamples: %d\nAmplitude (mean/median/max): %g / %g / %g" % (
+                stats['numSamples'], stats['meanAmp'], stats['medianAmp'], stats['maxAmp'])
+        return tip
+
+    def makeFileItem(self, filepath: str, size: int, stats: dict = None):
+        item = QListWidgetItem(filepath)
+        item.setToolTip(self.formatToolTip(size, stats))
+        return item
+
+    def addFileItems(self, filepaths: list):
+        for filepath, (size, stats) in zip(filepaths, self.statsdb.lookup(filepaths, *self.getStatsSettings())):
+            if size is not None:
+                self.flw.addItem(self.makeFileItem(filepath, size, stats))
+
+    @Slot()
+    def refreshToolTips(self):
+        items = [self.flw.item(i) for i in range(self.flw.count())]
+        lookups = self.statsdb.lookup([item.text() for item in items], *self.getStatsSettings())
+        for item, (size, stats) in zip(items, lookups):
+            if size is not None:
+                item.setToolTip(self.formatToolTip(size, stats))
+
+    @Slot()
+    def onFileListContextMenu(self, pos):
+        menu = QMenu()
+        statsAction = menu.addAction("Compute Statistics")
+        sortMenu = menu.addMenu("Sort By")
+        sortActions = {
+            sortMenu.addAction("Name"): None,
+            sortMenu.addAction("Size"): 'size',
+            sortMenu.addAction("Samples"): 'numSamples',
+            sortMenu.addAction("Mean Amplitude"): 'meanAmp',
+            sortMenu.addAction("Median Amplitude"): 'medianAmp',
+            sortMenu.addAction("Max Amplitude"): 'maxAmp'
+        }
+
+        action = menu.exec_(self.flw.mapToGlobal(pos))
+        if action == statsAction:
+            self.computeStats([i.text() for i in self.flw.selectedItems()])
+        elif action in sortActions:
+            self.sortFiles(sortActions[action])
+
+    def computeStats(self, filepaths: list):
+        if len(filepaths) == 0:
+            return
+
+        worker = FileStatsWorker(filepaths, self.getStatsSettings(), parent=self)
+        progress = QProgressDialog(
+            "Computing file statistics", None, 0, len(filepaths), parent=self)
+        worker.progressNow.connect(progress.setValue)
+        # Closed by the worker finishing rather than by the progress reaching the end, which a failure may skip.
+        # This is queued, so it only arrives once exec() is running
+        worker.finished.connect(progress.close)
+        worker.start()
+        progress.exec()
+        worker.wait()
+        self.refreshToolTips()
+
+    def sortFiles(self, key: str = None):
+        if key is None:
+            self.flw.setSortingEnabled(True)
+            self.flw.sortItems()
+        else:
+            # Answered from the cache; files without cached statistics go last
+            filepaths = self.getCurrentFilelist()
+            lookups = self.statsdb.lookup(filepaths, *self.getStatsSettings())
+            def sortKey(i):
+                size, stats = lookups[i]
+                value = size if key == 'size' else (None if stats is None else stats[key])
+                return (value is None, value if value is not None else 0)
+            order = sorted(range(len(filepaths)), key=sortKey)
+
+            self.flw.setSortingEnabled(False)  # Otherwise it re-sorts by name
+            self.flw.clear()
+            for i in order:
+                if lookups[i][0] is not None:
+                    self.flw.addItem(self.makeFileItem(filepaths[i], *lookups[i]))
+
+        self.updateFileListDBCache()
+        self.initOrderWidget()
+        self.refreshOrderWidget()
+
     ####################
     def initFileListDBCache(self):
         cur = self.db.cursor()
@@ -192,13 +306,13 @@ class FileListFrame(QFrame):
         r = sorted(r, key=operator.itemgetter(0))
         rpaths = [i[1] for i in r]
 
+        # One stat per file; the tooltips come from the statistics cache
+        lookups = self.statsdb.lookup(rpaths, *self.getStatsSettings())
         noLongerExist = 0
         for i in range(len(rpaths)):
-            item = QListWidgetItem(rpaths[i])
-            if os.path.exists(rpaths[i]):  # If file still exists
-                item.setToolTip("Size: %d bytes" %
-                                (os.path.getsize(rpaths[i])))
-                self.flw.addItem(item)
+            size, stats = lookups[i]
+            if size is not None:  # If file still exists
+                self.flw.addItem(self.makeFileItem(rpaths[i], size, stats))
             else:  # If it doesn't, remove it from the database
                 noLongerExist += 1
                 cur.execute("delete from filelistcache where path=?",
@@ -242,11 +356,7 @@ class FileListFrame(QFrame):
                                                                  "Open Complex Data Files", ".", "Complex Data Files (*.bin *.dat);;All Files (*)")
         if len(fileNames) > 0:  # When cancelled, it returns an empty list
             # self.flw.addItems(fileNames) # DEPRECATED
-            for i in range(len(fileNames)):
-                item = QListWidgetItem(fileNames[i])
-                item.setToolTip("Size: %d bytes" %
-                                (os.path.getsize(fileNames[i])))
-                self.flw.addItem(item)
+            self.addFileItems(fileNames)
         # Update cache
         self.updateFileListDBCache()
         # Set order widget
@@ -267,11 +377,7 @@ class FileListFrame(QFrame):
         if folderName is not None and len(folderName) > 0:
             folderFiles = os.listdir(folderName)
             fileNames = [os.path.join(folderName, i) for i in folderFiles]
-            for i in range(len(fileNames)):
-                item = QListWidgetItem(fileNames[i])
-                item.setToolTip("Size: %d bytes" %
-                                (os.path.getsize(fileNames[i])))
-                self.flw.addItem(item)
+            self.addFileItems(fileNames)
 
         # Update internal memory
         self.filepaths.extend(fileNames)
@@ -288,6 +394,47 @@ class FileListFrame(QFrame):
 
         self.addBtn.clicked.connect(self.onAddBtnClicked)
 
+    def prepareFollowBtn(self):
+        self.followBtn = QPushButton("Follow")
+        self.followBtn.setCheckable(True)
+        self.followBtn.setToolTip(
+            "Follows the selected file as it is being written, using the current file settings.")
+        self.btnLayout.addWidget(self.followBtn)
+
+        self.followBtn.toggled.connect(self.onFollowBtnToggled)
+
+    @Slot(bool)
+    def onFollowBtnToggled(self, checked: bool):
+        if not checked:
+            self.stopFollowSignal.emit()
+            return
+
+        filepaths = [i.text() for i in self.flw.selectedItems()]
+        if len(filepaths) != 1 or ".wav" in filepaths[0]:
+            QMessageBox.critical(self, "Follow Error",
+                                 "Select a single (non-wav) file to follow.",
+                                 QMessageBox.Ok, QMessageBox.Ok)
+            self.onFollowStopped()
+            return
+
+        self.cancelLoading()
+        self.followSignal.emit(
+            filepaths[0],
+            {
+                'fmt': self.fmt,
+                'headersize': self.headersize,
+                'sampleStart': self.sampleStart,
+                'swapEndian': self.swapEndian,
+                'invSpec': self.invSpec
+            })
+
+    @Slot()
+    def onFollowStopped(self):
+        # Uncheck without emitting another stop
+        self.followBtn.blockSignals(True)
+        self.followBtn.setChecked(False)
+        self.followBtn.blockSignals(False)
+
     '''This now invokes the settings dialog first.'''
     @Slot()
     def onAddBtnClicked(self):
@@ -310,10 +457,24 @@ class FileListFrame(QFrame):
         else:
             self.newFilesSignal.emit("", None, filepaths)
 
+    def getSelectedFilepaths(self):
+        return [i.text() for i in self.flw.selectedItems()]
+
+    def getFileSettings(self):
+        '''Settings that the selected files would be read with.'''
+        return {
+            'fmt': self.fmt,
+            'headersize': self.headersize,
+            'sampleStart': self.sampleStart,
+            'fixedlen': self.fixedlen if self.usefixedlen else -1,
+            'swapEndian': self.swapEndian,
+            'invSpec': self.invSpec
+        }
+
     '''This is now the second step of loading, after settings are confirmed.'''
     @Slot()
     def loadFiles(self):
-        filepaths = [i.text() for i in self.flw.selectedItems()]
+        filepaths = self.getSelectedFilepaths()
         rows = [i.row() for i in self.flw.selectionModel().selectedIndexes()]
         print(filepaths)
         print(rows)
@@ -338,7 +499,7 @@ class FileListFrame(QFrame):
             data.append(wavdata)
             data = np.array(data).flatten()
             print(data.shape)
-            self.dataSignal.emit(data, filepaths, sampleStarts)
+            self.dataSignal.emit(data, filepaths, sampleStarts, {}) # Not cached
             # Properly format the order widget
             self.order.clear()
             self.initOrderWidget()
@@ -357,27 +518,57 @@ class FileListFrame(QFrame):
         self.order.clear()
         self.initOrderWidget()
         for i in range(len(filepaths)):
-            filepath = filepaths[i]
-            d = np.fromfile(
-                filepath, dtype=self.fmt, count=cnt*2,  # x2 for complex samples
-                offset=self.headersize + self.sampleStart*self.fmt(1).itemsize*2)  # offset from the sample start as well if provided
-            data.append(d)
+            self.order[filepaths[i]] = i
+        self.refreshOrderWidget()
 
-            sampleStarts.append(int(d.size/2 + sampleStarts[-1]))
+        # Stop any earlier load that is still running
+        self.cancelLoading()
 
-            # Add to internal memory of current files
-            self.order[filepath] = i
+        filesettings = self.getFileSettings()
+        if self.useMemmap:
+            # Nothing is read here; samples are paged in as the views slice them
+            maps = openMemmaps(filepaths, self.fmt, self.headersize,
+                               self.sampleStart, cnt)
+            data = VirtualSampleArray(maps, self.swapEndian, self.invSpec)
+            self.dataSignal.emit(data, filepaths, data.sampleStarts, filesettings)
+        else:
+            # Read in the background, the data is emitted when it's done
+            self.loadWorker = FileLoadWorker(
+                filepaths,
+                filesettings,
+                # Only worth it for types narrower than the complex64 components
+                native=self.keepNative and np.dtype(self.fmt).itemsize < np.dtype(np.float32).itemsize,
+                parent=self)
+            self.loadWorker.progressNow.connect(self.loadProgressBar.setValue)
+            self.loadWorker.dataReady.connect(self.onDataLoaded)
+            self.loadWorker.finished.connect(self.onLoadingFinished)
+            self.loadProgressBar.setValue(0)
+            self.showLoadingProgress(True)
+            self.loadWorker.start()
 
-        self.refreshOrderWidget()
+    @Slot()
+    def cancelLoading(self):
+        if self.loadWorker is not None:
+            self.loadWorker.requestInterruption()
+            self.loadWorker.wait()
+            self.loadWorker = None
+        self.showLoadingProgress(False)
+
+    def showLoadingProgress(self, show: bool):
+        self.loadProgressBar.setVisible(show)
+        self.loadCancelBtn.setVisible(show)
+
+    @Slot(object, list, list)
+    def onDataLoaded(self, data, filepaths, sampleStarts):
+        if self.sender() is not self.loadWorker:
+            return # Queued from a cancelled load
+        self.dataSignal.emit(data, filepaths, sampleStarts, self.loadWorker.filesettings)
 
-        data = np.array(data).flatten()
-        if self.swapEndian:
-            print("Swapping endianness as requested")
-            data = data.byteswap(inplace=True)
-        data = data.astype(np.float32).view(np.complex64)
-        if self.invSpec:
-            data = data.conj()
-        self.dataSignal.emit(data, filepaths, sampleStarts)
+    @Slot()
+    def onLoadingFinished(self):
+        if self.sender() is not self.loadWorker:
+            return # Queued from a cancelled load, which must not hide the new one's progress
+        self.showLoadingProgress(False)
 
     ##################
 
@@ -424,17 +615,74 @@ class FileListFrame(QFrame):
             event.acceptProposedAction()
 
     def dropEvent(self, event):
-        for url in event.mimeData().urls():
-            droppedFilepath = url.toLocalFile()
-            item = QListWidgetItem(droppedFilepath)
-            item.setToolTip("Size: %d bytes" %
-                            (os.path.getsize(droppedFilepath)))
-            self.flw.addItem(item)
+        droppedFilepaths = [url.toLocalFile() for url in event.mimeData().urls()]
+        self.addFileItems(droppedFilepaths)
 
-            # Update internal memory
-            self.filepaths.append(droppedFilepath)
+        # Update internal memory
+        self.filepaths.extend(droppedFilepaths)
 
         # Update cache
         self.updateFileListDBCache()
         # Set order widget
         self.initOrderWidget()
+
+
+# =================================
+class FileLoadWorker(QThread):
+    progressNow = Signal(int)
+    dataReady = Signal(object, list, list)
+
+    def __init__(self, filepaths: list, filesettings: dict, native: bool = False, parent=None):
+        super().__init__(parent)
+
+        self.filepaths = filepaths
+        self.filesettings = filesettings
+        self.native = native
+
+    def run(self):
+        try:
+            if self.native:
+                # Keep the native samples, they are converted as they are sliced
+                segments = readRawSamples(
+                    self.filepaths, self.filesettings['fmt'], self.filesettings['headersize'],
+                    self.filesettings['sampleStart'], self.filesettings['fixedlen'],
+                    callback=self.checkProgress)
+                data = VirtualSampleArray(
+                    segments, self.filesettings['swapEndian'], self.filesettings['invSpec'])
+                sampleStarts = data.sampleStarts
+            else:
+                data, sampleStarts = readSamples(
+                    self.filepaths, **self.filesettings, callback=self.checkProgress)
+        except LoadCancelled:
+            print("Loading cancelled")
+            return
+
+        self.dataReady.emit(data, self.filepaths, sampleStarts)
+
+    def checkProgress(self, samplesRead: int, totalSamples: int):
+        # Called from the reading threads after every chunk
+        self.progressNow.emit(int(100 * samplesRead / totalSamples))
+        if self.isInterruptionRequested():
+            raise LoadCancelled()
+
+
+# =================================
+class FileStatsWorker(QThread):
+    progressNow = Signal(int)
+
+    def __init__(self, filepaths: list, statsSettings: tuple, parent=None):
+        super().__init__(parent)
+
+        self.filepaths = filepaths
+        self.statsSettings = statsSettings
+
+    def run(self):
+        # Needs its own connection in this thread
+        statsdb = FileStatsDB()
+        for i in range(len(self.filepaths)):
+            try:
+                statsdb.getOrComputeStats(self.filepaths[i], *self.statsSettings)
+            except Exception as e:
+                # Skip the file (it just gets no statistics) rather than stopping the rest
+                print("Could not compute statistics for %s: %s" % (self.filepaths[i], str(e)))
+            self.progressNow.emit(i+1)
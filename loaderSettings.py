@@ -62,15 +62,20 @@ class LoaderSettingsConfig:
             "usefixedlen": "False",
             "fixedlen": "-1",
             "invSpec": "False",
+            "useMemmap": "False",
+            "keepNative": "True",
+            "cacheBudget": "10",
             #####
             'nperseg': "128",
             'noverlap': "16",  # Note this is 128//8
+            'specMaxHold': "False",
             'fs': "1",
             'fc': "0.0",
             'freqshift': None,
             'numTaps': None,
             'filtercutoff': None,
             'dsr': None,
+            'lazyProcessing': "False",
             'sampleStart': "0"
         }
         # Write it if it doesn't exist
@@ -206,6 +211,32 @@ class LoaderSettingsDialog(QDialog):
         self.invertspecCheckbox = QCheckBox()
         self.formlayout.addRow("Inverted Spectrum?", self.invertspecCheckbox)
 
+        # Memory-mapping
+        self.memmapCheckbox = QCheckBox()
+        self.memmapCheckbox.setToolTip(
+            "Maps the files instead of reading them into memory.\n"
+            "Opening is almost instant, and samples are only read from disk when viewed."
+        )
+        self.formlayout.addRow("Memory-map Files (Lazy Loading)", self.memmapCheckbox)
+
+        # Native storage
+        self.keepNativeCheckbox = QCheckBox()
+        self.keepNativeCheckbox.setToolTip(
+            "Keeps complex int16 samples as they are in memory (half the size of complex64),\n"
+            "and only converts the samples that are being viewed or processed."
+        )
+        self.formlayout.addRow("Keep Native Sample Format", self.keepNativeCheckbox)
+
+        # Sidecar cache
+        self.cacheBudgetSpinbox = QSpinBox()
+        self.cacheBudgetSpinbox.setRange(0, 1000)
+        self.cacheBudgetSpinbox.setToolTip(
+            "Disk space for caching the overview and spectrogram of opened files,\n"
+            "so that reopening them with the same settings is almost instant.\n"
+            "The least recently opened are removed first; 0 disables the cache."
+        )
+        self.formlayout.addRow("Cache Budget (GB)", self.cacheBudgetSpinbox)
+
         # Signal Viewer Layout
         self.sformlayout = QFormLayout()
         self.viewerGroupBox.setLayout(self.sformlayout)
@@ -228,6 +259,14 @@ class LoaderSettingsDialog(QDialog):
         self.sformlayout.addRow(self.specNoverlapLabel,
                                 self.specNoverlapSpinbox)
 
+        # Specgram column combining
+        self.specMaxHoldCheckbox = QCheckBox()
+        self.specMaxHoldCheckbox.setToolTip(
+            "Long captures are shown with several windows combined into each column.\n"
+            "By default they are averaged; max-hold keeps short transients visible instead."
+        )
+        self.sformlayout.addRow("Spectrogram Max-Hold", self.specMaxHoldCheckbox)
+
         # Sample Rate
         self.fsEdit = QLineEdit()
         self.sformlayout.addRow(
@@ -280,6 +319,15 @@ class LoaderSettingsDialog(QDialog):
         self.sformlayout.addRow(
             "Sample Rate After Downsampling", self.fsAfterDownsampleEdit)
 
+        # Lazy processing
+        self.lazyProcessingCheckbox = QCheckBox()
+        self.lazyProcessingCheckbox.setToolTip(
+            "Only shifts, filters and downsamples the samples that are viewed at full resolution,\n"
+            "selected or analysed, instead of the whole capture when it is opened.\n"
+            "The zoomed-out overviews are then of the unprocessed samples."
+        )
+        self.sformlayout.addRow("Process Lazily (Only What Is Viewed)", self.lazyProcessingCheckbox)
+
         # Special type-handling
         if specialType != "":
             self.layout.addWidget(QLabel(
@@ -431,15 +479,20 @@ class LoaderSettingsDialog(QDialog):
             # "fixedlen": int(self.fixedlenEdit.text()) if self.fixedlenEdit.isEnabled() else -1,
             "swapEndian": self.endiannessCheckBox.isChecked(),
             "invSpec": self.invertspecCheckbox.isChecked(),
+            "useMemmap": self.memmapCheckbox.isChecked(),
+            "keepNative": self.keepNativeCheckbox.isChecked(),
+            "cacheBudget": self.cacheBudgetSpinbox.value(),
             ###########################
             'nperseg': int(self.specNpersegDropdown.currentText()),
             'noverlap': self.specNoverlapSpinbox.value(),
+            'specMaxHold': self.specMaxHoldCheckbox.isChecked(),
             'fs': int(float(self.fsEdit.text())),
             'fc': float(self.fcEdit.text()) + float(self.freqshiftEdit.text()) if self.freqshiftCheckbox.isChecked() else 0,
             'freqshift': float(self.freqshiftEdit.text()) if self.freqshiftCheckbox.isChecked() else None,
             'numTaps': int(self.numTapsDropdown.currentText()) if self.filterCheckbox.isChecked() else None,
             'filtercutoff': float(self.cutoffEdit.text()) if self.filterCheckbox.isChecked() else None,
-            'dsr': int(self.downsampleEdit.text()) if self.downsampleCheckbox.isChecked() else None
+            'dsr': int(self.downsampleEdit.text()) if self.downsampleCheckbox.isChecked() else None,
+            'lazyProcessing': self.lazyProcessingCheckbox.isChecked()
         }
         # Special cases depending on number of files
         if len(self.filesizes) == 1:  # For a single file, we always use a fixed length
@@ -597,6 +650,15 @@ class LoaderSettingsDialog(QDialog):
             # Inverted Spectrum
             self.invertspecCheckbox.setChecked(cfg.getboolean('invSpec'))
 
+            # Memory-mapping
+            self.memmapCheckbox.setChecked(cfg.getboolean('useMemmap', fallback=False))
+
+            # Native storage
+            self.keepNativeCheckbox.setChecked(cfg.getboolean('keepNative', fallback=True))
+
+            # Sidecar cache
+            self.cacheBudgetSpinbox.setValue(cfg.getint('cacheBudget', fallback=10))
+
             #################################
             # Specgram nperseg
             self.specNpersegDropdown.setCurrentText(cfg.get('nperseg'))
@@ -604,6 +666,9 @@ class LoaderSettingsDialog(QDialog):
             # Specgram Noverlap
             self.specNoverlapSpinbox.setValue(cfg.getint('noverlap'))
 
+            # Specgram column combining
+            self.specMaxHoldCheckbox.setChecked(cfg.getboolean('specMaxHold', fallback=False))
+
             # Sample Rate
             self.fsEdit.setText(cfg.get('fs'))
 
@@ -640,6 +705,9 @@ class LoaderSettingsDialog(QDialog):
                 self.downsampleCheckbox.setChecked(False)
                 self.downsampleEdit.setEnabled(False)
 
+            # Lazy processing
+            self.lazyProcessingCheckbox.setChecked(cfg.getboolean('lazyProcessing', fallback=False))
+
         except Exception as e:
             # This usually occurs when you change the loadersettings, then
             # the old file will not have the correct keys.
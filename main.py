@@ -67,6 +67,9 @@ class ReimageMain(QtWidgets.QMainWindow):
         # Connections
         self.fileListFrame.dataSignal.connect(self.onNewData)
         self.fileListFrame.newFilesSignal.connect(self.newFilesHandler)
+        self.fileListFrame.followSignal.connect(self.sv.followFile)
+        self.fileListFrame.stopFollowSignal.connect(self.sv.stopFollowing)
+        self.sv.followStoppedSignal.connect(self.fileListFrame.onFollowStopped)
         # self.fileListFrame.sampleRateSignal.connect(self.setSampleRate)
 
         self.sidebar.addSmaSignal.connect(self.sv.addSma)
@@ -84,6 +87,7 @@ class ReimageMain(QtWidgets.QMainWindow):
 
         self.fileListFrame.dataSignal.connect(
             self.sidebar.reset)  # Clear all settings on new data
+        self.fileListFrame.followSignal.connect(self.sidebar.reset)
 
         self.resizedSignal.connect(self.fileListFrame.onResizedWindow)
         self.exportToImageSignal.connect(self.sv.exportToImageSlot)
@@ -136,15 +140,23 @@ class ReimageMain(QtWidgets.QMainWindow):
 
     def closeEvent(self, event):
         """QWidget handler for the destructor. Do not use __del__ for this!"""
+        # Stop any background loading/processing
+        self.fileListFrame.cancelLoading()
+        self.sv.cancelProcessing()
+        self.sv.stopFollowing()
+        self.sv.stopReslicing()
+        self.sv.cancelSmas()
+
         # Handle listener thread cleanup
         print("Handling listenerThread cleanup...")
         self.listenerThread.graceful_kill()
         self.listenerThread.wait()
 
-    @QtCore.Slot(np.ndarray, list, list)
-    def onNewData(self, data, filelist, sampleStarts):
+    @QtCore.Slot(object, list, list, dict)
+    def onNewData(self, data, filelist, sampleStarts, filesettings):
         # this calls the plot automatically
-        self.sv.setYData(data, filelist, sampleStarts)
+        self.sv.setYData(data, filelist, sampleStarts,
+                         filesettings if len(filesettings) > 0 else None)
         self.tb = TutorialBubble(
             "Look at the toolbar below for shortcuts to interact with the data.\n\n"
             "Hold Left-Click to pan\n"
@@ -211,10 +223,14 @@ class ReimageMain(QtWidgets.QMainWindow):
                 'fmt': self.fileListFrame.fmt,
                 'headersize': self.fileListFrame.headersize,
                 'usefixedlen': self.fileListFrame.usefixedlen,
-                'fixedlen': self.fileListFrame.fixedlen
+                'fixedlen': self.fileListFrame.fixedlen,
+                'swapEndian': self.fileListFrame.swapEndian,
+                'invSpec': self.fileListFrame.invSpec
             }
         )  # TODO: write getter for this
         dialog.predetectAmpSignal.connect(self.fileListFrame.highlightFiles)
+        # Predetection fills in the statistics cache, so the tooltips can show them now
+        dialog.predetectAmpSignal.connect(self.fileListFrame.refreshToolTips)
         dialog.exec()
 
     # End of menu bar slots
@@ -254,9 +270,18 @@ class ReimageMain(QtWidgets.QMainWindow):
         dialog.settingsSignal.connect(self.saveSettings)
         dialog.configSignal.connect(self.saveConfigName)
         # If accepted then we load files
-        dialog.accepted.connect(self.fileListFrame.loadFiles)
+        dialog.accepted.connect(self.onLoaderSettingsAccepted)
         dialog.exec()
 
+    @QtCore.Slot()
+    def onLoaderSettingsAccepted(self):
+        # Files already being viewed aren't read again; only the stages whose settings changed are recomputed
+        if self.sv.isLoaded(self.fileListFrame.getSelectedFilepaths(), self.fileListFrame.getFileSettings()):
+            self.sidebar.reset()
+            self.sv.reprocess()
+        else:
+            self.fileListFrame.loadFiles()
+
     @QtCore.Slot(str)
     def saveConfigName(self, newconfigname):
         # Updates the last used config name so that subsequent opens use it
@@ -267,6 +292,7 @@ class ReimageMain(QtWidgets.QMainWindow):
         # Combine both setters here
         self.sv.nperseg = newsettings['nperseg']
         self.sv.noverlap = newsettings['noverlap']
+        self.sv.specMaxHold = newsettings['specMaxHold']
         self.sv.fs = newsettings['fs']
         self.sv.fc = newsettings['fc']
         # Above settings only change visuals; used in ipc methods
@@ -275,6 +301,8 @@ class ReimageMain(QtWidgets.QMainWindow):
         self.sv.numTaps = newsettings['numTaps']
         self.sv.filtercutoff = newsettings['filtercutoff']
         self.sv.dsr = newsettings['dsr']
+        self.sv.lazyProcessing = newsettings['lazyProcessing']
+        self.sv.cacheBudget = newsettings['cacheBudget']
         ####################
         formatsToDtype = {
             'complex int16': np.int16,
@@ -288,6 +316,9 @@ class ReimageMain(QtWidgets.QMainWindow):
         self.fileListFrame.fixedlen = newsettings['fixedlen']
         self.fileListFrame.invSpec = newsettings['invSpec']
         self.fileListFrame.sampleStart = newsettings['sampleStart']
+        self.fileListFrame.useMemmap = newsettings['useMemmap']
+        self.fileListFrame.keepNative = newsettings['keepNative']
+        self.fileListFrame.refreshToolTips()  # Cached statistics depend on the format
 
     def resizeEvent(self, event):
         self.resizedSignal.emit()
@@ -55,10 +55,10 @@ class PhasorWindow(QMainWindow):
     #################### Plotting methods
     @Slot(np.ndarray, int)
     def updateData(self, data: np.ndarray, centreIdx: int):
-        # This comes in as complex data (enforce complex128 for simplicity)
-        self.data = data.astype(np.complex128)
+        # This comes in as complex data (kept as complex64)
+        self.data = np.ascontiguousarray(data, dtype=np.complex64)
         # View as reals, pack into rows of (x,y)
-        self.data = self.data.view(np.float64).reshape((-1,2))
+        self.data = self.data.view(np.float32).reshape((-1,2))
         # Plot the data
         self.plot(centreIdx)
 
@@ -5,6 +5,8 @@ import numpy as np
 
 import time
 
+from statsdb import FileStatsDB
+
 class PredetectAmpDialog(QDialog):
     predetectAmpSignal = Signal(list)
 
@@ -93,7 +95,7 @@ class PredetectAmpDialog(QDialog):
 
         # Launch a thread?
         results = [False for i in range(len(self.filelist))]
-        self.worker = PredetectAmpWorker(self.filelist, options, results, parent=self)
+        self.worker = PredetectAmpWorker(self.filelist, options, results, self.filesettings, parent=self)
         # self.worker.resultReady.connect(self.handleResults)
         # self.worker.finished.connect(self.worker.deleteLater)
         self.worker.start()
@@ -126,48 +128,46 @@ class PredetectAmpWorker(QThread):
     resultReady = Signal(list)
     progressNow = Signal(int)
 
-    def __init__(self, filelist: list, options: dict, results: list, parent=None):
+    def __init__(self, filelist: list, options: dict, results: list, filesettings: dict = None, parent=None):
         super().__init__(parent)
 
         self.filelist = filelist
         self.options = options
         self.results = results
+        self.filesettings = {} if filesettings is None else filesettings
 
     def run(self):
-
-        if self.options['ratioMode']:
-            for i in range(len(self.filelist)):
-                # Open the file
-                data = np.fromfile(self.filelist[i], dtype=np.int16) # TODO: get the file settings
-                data = data.astype(np.float32).view(np.complex64)
-                absdata = np.abs(data)
-
+        # The statistics are cached in cache.db, so each file is only read the first time
+        # (sqlite connections can't be shared across threads, so this opens its own)
+        statsdb = FileStatsDB()
+
+        for i in range(len(self.filelist)):
+            stats = statsdb.getOrComputeStats(
+                self.filelist[i],
+                self.filesettings.get('fmt', np.int16),
+                self.filesettings.get('headersize', 0),
+                self.filesettings.get('swapEndian', False),
+                self.filesettings.get('invSpec', False))
+            if stats is None or stats['numSamples'] == 0:
+                self.results[i] = False
+
+            elif self.options['ratioMode']:
                 # Noise floor determination
                 if self.options['meanNoise']:
-                    noisefloor = np.mean(absdata)
+                    noisefloor = stats['meanAmp']
 
                 elif self.options['medianNoise']:
-                    noisefloor = np.median(absdata)
+                    noisefloor = stats['medianAmp']
 
                 # Detect signal presence
-                found = np.any(absdata > (noisefloor * self.options['snr']))
+                found = stats['maxAmp'] > (noisefloor * self.options['snr'])
                 self.results[i] = found
 
-                self.progressNow.emit(i+1)
-                
-            # self.resultReady.emit(self.results)
-
-        elif self.options['thresholdMode']:
-            for i in range(len(self.filelist)):
-                # Open the file
-                data = np.fromfile(self.filelist[i], dtype=np.int16) # TODO: get the file settings
-                data = data.astype(np.float32).view(np.complex64)
-                absdata = np.abs(data)
-
+            elif self.options['thresholdMode']:
                 # Detect signal presence
-                found = np.any(absdata > self.options['threshold'])
+                found = stats['maxAmp'] > self.options['threshold']
                 self.results[i] = found
 
-                self.progressNow.emit(i+1)
-                
-            # self.resultReady.emit(self.results)
\ No newline at end of file
+            self.progressNow.emit(i+1)
+
+        # self.resultReady.emit(self.results)
@@ -0,0 +1,450 @@
+'''
+The processing of the loaded samples, as an explicit chain of stages:
+
+    source -> ddc -> pyramid
+                  -> spectrogram
+
+where ddc is the frequency shift, filter and downsampling (see DownConverter). With lazy processing,
+the ddc output is a DownConvertedArray that is only computed where it is sliced, and the overviews
+(pyramid and spectrogram) are of the unprocessed samples on the same grid instead:
+
+    source -> ddc (lazy)
+           -> grid -> pyramid
+                   -> spectrogram
+
+so that nothing has to process the whole capture up front. Those overviews are from before the shift
+and the filter (out of band signals are still in them, aliased by any downsampling), so the spectrogram
+is labelled with the centre frequency from before the shift (see spectrogramFc()), and the finer
+spectrogram tiles of the view are computed from the grid as well.
+
+Each stage keeps its last output, keyed by the parameters it depends on together with the key of
+the stage it reads from, so changing a setting only recomputes the stages downstream of it.
+
+The sample rate and the centre frequency mostly just label the axes. The ddc stage only depends
+on the shift and the filter cutoff relative to fs, and the spectrogram is kept with the fs and fc
+it was labelled with, and relabelled (see relabelSpectrogram()) instead of recomputed.
+
+The chain runs the same from a script as it does behind the view (which passes hooks to run()
+to show a coarse spectrogram first and refine it progressively, see coarseSpectrogram()), e.g.
+
+    chain = ProcessingChain()
+    chain.setSource(x)
+    params = dict(DEFAULT_PARAMS, fs=1e6, dsr=4, nperseg=512)
+    spec = chain.run('spectrogram', params)
+    params['nperseg'] = 1024
+    spec = chain.run('spectrogram', params) # Reuses the ddc output
+    print(chain.describe())
+'''
+
+import numpy as np
+import scipy.signal as sps
+
+from dsp import averagedSpectrogram, budgetedSegsPerCol, powerHistogram, DownConverter
+from pyramid import MinMaxPyramid
+from sidecar import SidecarCache
+
+OVERVIEW_BYTES = 16 << 20 # Segments are combined into columns to keep the overview spectrogram within this
+DDC_BLOCK = 1 << 20 # Number of samples down-converted at a time
+REFINE_SEGMENTS = 1 << 17 # Segments of the overview refined at a time, see refineSpectrogram()
+
+# Same names (and defaults) as the settings of the SignalView
+DEFAULT_PARAMS = {
+    'fs': 1, 'fc': 0, 'freqshift': None, 'numTaps': None, 'filtercutoff': None, 'dsr': None,
+    'nperseg': 256, 'noverlap': 256/8, 'window': ('tukey',0.25), 'maxHold': False, 'lazy': False,
+}
+
+
+def displayedFs(params: dict):
+    '''Sample rate after the ddc stage, which everything downstream of it is labelled with.'''
+    return params['fs'] if params['dsr'] is None else params['fs'] / params['dsr']
+
+def processLazily(params: dict):
+    '''Whether the ddc stage is lazy for these parameters; without a shift or filter there is nothing to put off.'''
+    return params.get('lazy', False) and (params['freqshift'] is not None or params['numTaps'] is not None)
+
+def spectrogramFc(params: dict):
+    '''
+    Centre frequency that the spectrogram is labelled with. params['fc'] is that of the ddc output,
+    which includes the shift, so the unshifted grid of lazy processing is labelled with fc - freqshift.
+    '''
+    if processLazily(params) and params['freqshift'] is not None:
+        return params['fc'] - params['freqshift']
+    return params['fc']
+
+def downConvert(x, fs: float, freqshift, numTaps, filtercutoff, dsr, callback=None):
+    """
+    Output of the ddc stage: x shifted by freqshift, filtered by numTaps of a lowpass at filtercutoff,
+    and downsampled by dsr; any of these can be None to skip it. x is fed to one DownConverter
+    a block at a time, so it can be a VirtualSampleArray. If provided, callback(samplesDone, totalSamples)
+    is called after every block.
+    """
+    # Nothing to do, so leave lazily loaded data alone
+    if freqshift is None and numTaps is None:
+        return x if dsr is None else x[::dsr]
+
+    taps = None if numTaps is None else sps.firwin(numTaps, filtercutoff/fs)
+    ddc = DownConverter(fs, freqshift, taps, 1 if dsr is None else dsr)
+    out = np.empty(ddc.outputSize(x.size), dtype=np.complex64)
+    o = 0
+    for i0 in range(0, x.size, DDC_BLOCK):
+        i1 = min(i0 + DDC_BLOCK, x.size)
+        kept = ddc.process(x, i0, i1)
+        out[o:o + kept.size] = kept
+        o += kept.size
+        if callback is not None:
+            callback(i1, x.size)
+    return out
+
+class DownConvertedArray:
+    '''
+    Read-only, array-like output of the ddc stage (see downConvert()) that is only computed for the
+    samples sliced from it, e.g. by the view, a selection or an analysis window. Like VirtualSampleArray,
+    indexing with an integer or a slice returns complex64 values.
+
+    Each slice seeks a DownConverter to its first sample, which reads the numTaps-1 samples before
+    it for the filter state, so the values are the same as those of downConvert() over all of x.
+    '''
+
+    def __init__(self, x, fs: float, freqshift, numTaps, filtercutoff, dsr):
+        self.x = x
+        self.fs = fs
+        self.freqshift = freqshift
+        self.dsr = 1 if dsr is None else dsr
+        self.taps = None if numTaps is None else sps.firwin(numTaps, filtercutoff/fs)
+
+    @property
+    def size(self):
+        return len(range(0, self.x.size, self.dsr))
+
+    @property
+    def shape(self):
+        return (self.size,)
+
+    @property
+    def ndim(self):
+        return 1
+
+    @property
+    def dtype(self):
+        return np.dtype(np.complex64)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._getSlice(*key.indices(self.size))
+
+        # Otherwise treat as a single integer index
+        idx = int(key)
+        if idx < 0:
+            idx += self.size
+        if idx < 0 or idx >= self.size:
+            raise IndexError("Index %d out of range for %d samples" % (key, self.size))
+        return self._getSlice(idx, idx + 1, 1)[0]
+
+    def _getSlice(self, start: int, stop: int, step: int):
+        if step <= 0:
+            raise ValueError("Only positive slice steps are supported")
+        length = len(range(start, stop, step))
+        if length == 0:
+            return np.empty(0, dtype=np.complex64)
+        last = start + (length - 1) * step
+        ddc = DownConverter(self.fs, self.freqshift, self.taps, self.dsr)
+
+        out = np.empty(length, dtype=np.complex64)
+        if self.taps is None:
+            # Each output is just its own input, shifted
+            stride = step * self.dsr
+            for o0 in range(0, length, DDC_BLOCK):
+                o1 = min(o0 + DDC_BLOCK, length)
+                i0 = (start + o0 * step) * self.dsr
+                i1 = (start + (o1 - 1) * step) * self.dsr + 1
+                out[o0:o1] = self.x[i0:i1:stride]
+                if self.freqshift is not None:
+                    out[o0:o1] *= ddc.nco(np.arange(i0, i1, stride))
+            return out
+
+        # Consecutive blocks from the first output, keeping every step-th
+        ddc.seek(self.x, start * self.dsr)
+        k = start # Output index of the next block's first sample
+        end = last * self.dsr + 1
+        for i0 in range(start * self.dsr, end, DDC_BLOCK):
+            kept = ddc.process(self.x, i0, min(i0 + DDC_BLOCK, end))
+            o = -(-(k - start) // step)
+            picked = kept[start + o * step - k::step]
+            out[o:o + picked.size] = picked
+            k += kept.size
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        out = self._getSlice(0, self.size, 1)
+        return out if dtype is None else out.astype(dtype)
+
+def overviewStride(x, nperseg: int, noverlap):
+    '''Segments per column of the overview spectrogram of x, to keep it within OVERVIEW_BYTES.'''
+    hop = int(nperseg - noverlap)
+    numSegs = (x.size - nperseg) // hop + 1 if x.size >= nperseg else 0
+    numFreqs = nperseg if np.iscomplexobj(x) else nperseg // 2 + 1
+    return budgetedSegsPerCol(numSegs, numFreqs, OVERVIEW_BYTES)
+
+def overviewSpectrogram(x, fs: float, fc: float, window, nperseg: int, noverlap, maxHold: bool = False, callback=None):
+    """
+    Output of the spectrogram stage, computed in one go: the overview that the view shows
+    when zoomed out, which averages (or max-holds) overviewStride() segments per column.
+
+    Returns
+    -------
+    spec : dict
+        With keys freqs, ts, sxx, hist, sxxMax, sxxMin and stride (see averagedSpectrogram()
+        and powerHistogram()), and the fs and fc they are labelled with.
+    """
+    # Not enough to even plot 1 segment
+    if x.size < nperseg:
+        x = np.pad(x[:], (0, nperseg - x.size))
+    stride = overviewStride(x, nperseg, noverlap)
+    freqs, ts, sxx, sxxMin, sxxMax = averagedSpectrogram(
+        x, fs, window, nperseg, noverlap, stride, maxHold=maxHold, shift=True, callback=callback)
+    return {
+        'freqs': freqs + fc, 'ts': ts, 'sxx': sxx, 'hist': powerHistogram(sxx)[1],
+        'sxxMax': float(sxxMax), 'sxxMin': float(sxxMin), 'stride': stride, 'fs': fs, 'fc': fc}
+
+def coarseSpectrogram(x, fs: float, fc: float, window, nperseg: int, noverlap, callback=None):
+    """
+    Spectrogram on the grid of the overview (see overviewSpectrogram()), using only the first segment of each column.
+    It is much quicker than the full overview, which refineSpectrogram() then fills in.
+
+    Returns
+    -------
+    spec : dict
+        As from overviewSpectrogram(); stride is 1 if this is already the full overview.
+    """
+    stride = overviewStride(x, nperseg, noverlap)
+    if x.size < nperseg or stride == 1:
+        # Short enough to do properly straight away
+        return overviewSpectrogram(x, fs, fc, window, nperseg, noverlap, callback=callback)
+
+    # Gather the first segment of every column and transform them back to back
+    hop = int(nperseg - noverlap)
+    numSegs = (x.size - nperseg) // hop + 1
+    starts = np.arange(0, numSegs, stride) * hop
+    if isinstance(x, np.ndarray):
+        segs = np.lib.stride_tricks.sliding_window_view(x, nperseg)[starts].reshape(-1)
+    else:
+        segs = np.empty(starts.size * nperseg, dtype=x.dtype)
+        for i, start in enumerate(starts):
+            segs[i*nperseg:(i+1)*nperseg] = x[start:start+nperseg]
+            if callback is not None and i % 4096 == 0:
+                callback(i, starts.size)
+    freqs, _, sxx, sxxMin, sxxMax = averagedSpectrogram(segs, fs, window, nperseg, 0, 1, shift=True)
+    # Same column centres as the averaged overview
+    ts = ((np.arange(starts.size) * stride + (stride - 1)/2) * hop + nperseg/2) / fs
+
+    # Built now, so contrast percentiles never need a sort of the whole image
+    return {
+        'freqs': freqs + fc, 'ts': ts, 'sxx': sxx, 'hist': powerHistogram(sxx)[1],
+        'sxxMax': float(sxxMax), 'sxxMin': float(sxxMin), 'stride': stride, 'fs': fs, 'fc': fc}
+
+def refineSpectrogram(
+    x, coarse: dict, window, nperseg: int, noverlap, maxHold: bool = False, callback=None, onRefined=None
+):
+    """
+    The overview of x (as from overviewSpectrogram()), computed over the columns of the coarse one
+    from coarseSpectrogram() REFINE_SEGMENTS segments at a time. If provided, callback(segmentsDone, totalSegments)
+    is called as it goes, and onRefined(c0, cols, hist, sxxMax, sxxMin) after each chunk, with its columns
+    (from column c0), and the histograms and levels with them swapped in.
+    """
+    stride = coarse['stride']
+    if stride == 1:
+        return coarse
+    numCols = coarse['sxx'].shape[1]
+    numSegs = (x.size - nperseg) // int(nperseg - noverlap) + 1
+
+    sxx = np.empty_like(coarse['sxx'])
+    hist = coarse['hist'].copy()
+    sxxMax, sxxMin = -np.inf, np.inf
+    chunk = max(REFINE_SEGMENTS // stride, 1)
+    for c0 in range(0, numCols, chunk):
+        c1 = min(c0 + chunk, numCols)
+        progress = None if callback is None else lambda done, total: callback(c0 * stride + done, numSegs)
+        _, _, cols, colsMin, colsMax = averagedSpectrogram(
+            x, coarse['fs'], window, nperseg, noverlap, stride, c0 * stride, c1 * stride,
+            maxHold=maxHold, shift=True, callback=progress)
+        sxx[:, c0:c1] = cols
+        sxxMax = max(sxxMax, colsMax)
+        sxxMin = min(sxxMin, colsMin)
+        g0, counts = powerHistogram(coarse['sxx'][:, c0:c1], c0)
+        hist[g0:g0+counts.shape[0]] -= counts
+        g0, counts = powerHistogram(cols, c0)
+        hist[g0:g0+counts.shape[0]] += counts
+
+        if onRefined is not None:
+            # The coarse columns that are left still count towards the levels, until the last chunk
+            if c1 < numCols:
+                onRefined(c0, cols, hist.copy(), max(sxxMax, coarse['sxxMax']), min(sxxMin, coarse['sxxMin']))
+            else:
+                onRefined(c0, cols, hist.copy(), sxxMax, sxxMin)
+
+    return dict(coarse, sxx=sxx, hist=hist, sxxMax=float(sxxMax), sxxMin=float(sxxMin))
+
+def relabelSpectrogram(spec: dict, fs: float, fc: float):
+    """
+    The output of the spectrogram stage, labelled for the sample rate fs (after downsampling) and
+    centre frequency fc. Frequencies and times are rescaled, and so is the power, since it is a density.
+    The same dict is returned if the labels are unchanged.
+    """
+    if spec['fs'] == fs and spec['fc'] == fc:
+        return spec
+    scale = spec['fs'] / fs
+    sxx = spec['sxx'] * np.float32(scale) if scale != 1 else spec['sxx']
+    return {
+        'freqs': (spec['freqs'] - spec['fc']) / scale + fc,
+        'ts': spec['ts'] * scale,
+        'sxx': sxx,
+        'hist': powerHistogram(sxx)[1] if scale != 1 else spec['hist'],
+        'sxxMax': spec['sxxMax'] * scale, 'sxxMin': spec['sxxMin'] * scale,
+        'stride': spec['stride'], 'fs': fs, 'fc': fc}
+
+
+class ProcessingChain:
+    # Stage that each stage reads from, see inputOf()
+    INPUTS = {'ddc': 'source', 'grid': 'source', 'pyramid': 'ddc', 'spectrogram': 'ddc'}
+
+    def __init__(self, ydata=None):
+        self.sourceKey = None
+        self.outputs = {} # Stage -> (key, output)
+        if ydata is not None:
+            self.setSource(ydata)
+
+    @staticmethod
+    def makeSourceKey(ydata, filelist: list = None, filesettings: dict = None):
+        '''Files are identified as in the sidecar cache, anything else by the identity of ydata.'''
+        if filelist and filesettings is not None:
+            key = SidecarCache.makeKey(filelist, filesettings, {})
+            if key is not None:
+                return key
+        return ('data', id(ydata))
+
+    def setSource(self, ydata, filelist: list = None, filesettings: dict = None):
+        """
+        Sets the samples at the start of the chain. If they are the same files, read with the same
+        settings, as the current source, every stage is kept (including the current source data).
+
+        Returns
+        -------
+        same : bool
+            Whether the source is unchanged.
+        """
+        key = self.makeSourceKey(ydata, filelist, filesettings)
+        if key == self.sourceKey:
+            return True
+        self.sourceKey = key
+        self.outputs = {'source': (key, ydata)}
+        return False
+
+    def getSource(self):
+        entry = self.outputs.get('source')
+        return None if entry is None else entry[1]
+
+    def clear(self):
+        self.sourceKey = None
+        self.outputs = {}
+
+    @classmethod
+    def inputOf(cls, stage: str, params: dict):
+        '''Stage that a stage reads from; the overviews are of the unprocessed grid when processing lazily.'''
+        if stage in ('pyramid', 'spectrogram') and processLazily(params):
+            return 'grid'
+        return cls.INPUTS[stage]
+
+    @staticmethod
+    def stageParams(stage: str, params: dict):
+        '''The parameters that the output of a stage depends on, other than its input.'''
+        if stage == 'ddc':
+            # Only relative to fs, so that changing fs alone keeps it
+            return (
+                None if params['freqshift'] is None else params['freqshift'] / params['fs'],
+                None if params['numTaps'] is None else (params['numTaps'], params['filtercutoff'] / params['fs']),
+                params['dsr'], processLazily(params))
+        if stage == 'grid':
+            return (params['dsr'],)
+        if stage == 'spectrogram':
+            return (params['nperseg'], params['noverlap'], params['window'], params['maxHold'])
+        return ()
+
+    def key(self, stage: str, params: dict):
+        if stage == 'source':
+            return self.sourceKey
+        return (self.key(self.inputOf(stage, params), params), stage, self.stageParams(stage, params))
+
+    def get(self, stage: str, params: dict):
+        '''Output of a stage for these parameters, or None if it isn't cached.'''
+        entry = self.outputs.get(stage)
+        if entry is None or entry[0] != self.key(stage, params):
+            return None
+        return entry[1]
+
+    def store(self, stage: str, params: dict, output):
+        '''Caches the output of a stage for these parameters, replacing any other, and returns it.'''
+        self.outputs[stage] = (self.key(stage, params), output)
+        return output
+
+    def run(self, stage: str, params: dict, callback=None, onCoarse=None, onRefined=None):
+        """
+        Output of a stage, computing it (and the stages it reads from) if it isn't cached.
+        Spectrograms are labelled for the fs and fc of params (see spectrogramFc()). If provided, callback(stage, done, total)
+        is called as each stage is computed; it may raise to cancel, and nothing is stored for that stage.
+
+        If onCoarse is provided, a spectrogram that isn't cached is computed progressively instead:
+        onCoarse(spec) is called with the coarse one (see coarseSpectrogram()), and onRefined with
+        each chunk as it is refined (see refineSpectrogram()).
+        """
+        output = self.get(stage, params)
+        if output is None:
+            if stage == 'source':
+                raise ValueError("The chain has no source")
+            x = self.run(self.inputOf(stage, params), params, callback)
+            progress = None if callback is None else lambda done, total: callback(stage, done, total)
+            if stage == 'ddc' and processLazily(params):
+                output = DownConvertedArray(
+                    x, params['fs'], params['freqshift'], params['numTaps'], params['filtercutoff'], params['dsr'])
+            elif stage == 'grid':
+                output = downConvert(x, params['fs'], None, None, None, params['dsr'])
+            elif stage == 'ddc':
+                output = downConvert(
+                    x, params['fs'], params['freqshift'], params['numTaps'], params['filtercutoff'], params['dsr'],
+                    callback=progress)
+            elif stage == 'pyramid':
+                output = MinMaxPyramid.build(x, callback=progress)
+            elif onCoarse is None:
+                output = overviewSpectrogram(
+                    x, displayedFs(params), spectrogramFc(params), params['window'], params['nperseg'], params['noverlap'],
+                    params['maxHold'], callback=progress)
+            else:
+                coarse = coarseSpectrogram(
+                    x, displayedFs(params), spectrogramFc(params), params['window'], params['nperseg'], params['noverlap'],
+                    callback=progress)
+                onCoarse(coarse)
+                output = refineSpectrogram(
+                    x, coarse, params['window'], params['nperseg'], params['noverlap'], params['maxHold'],
+                    callback=progress, onRefined=onRefined)
+            self.store(stage, params, output)
+        if stage == 'spectrogram':
+            return relabelSpectrogram(output, displayedFs(params), spectrogramFc(params))
+        return output
+
+    def describe(self, params: dict = None):
+        '''One line for each stage, with the parameters it was computed with, and whether it is current for params.'''
+        lines = []
+        for stage in ('source',) + tuple(self.INPUTS):
+            entry = self.outputs.get(stage)
+            if entry is None:
+                lines.append("%s: not computed" % (stage))
+                continue
+            status = "" if params is None else (
+                " (current)" if entry[0] == self.key(stage, params) else " (stale)")
+            if stage == 'source':
+                lines.append("source: %d samples, %s%s" % (entry[1].size, str(entry[0]), status))
+            else:
+                lines.append("%s: %s%s" % (stage, str(entry[0][2]), status))
+        return "\n".join(lines)
@@ -0,0 +1,218 @@
+'''
+Multi-resolution min/max overview of complex samples, for drawing the time-domain plots.
+
+Level 0 summarises blocks of BASE samples, and every level above halves the number of
+blocks. Each block keeps the min/max amplitude, mean power and min/max real/imag parts,
+so a plot that picks the level closest to its pixel width can draw an envelope that
+never loses a peak, at a cost that depends only on the number of pixels.
+'''
+
+import numpy as np
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from sampleLoader import GrowableArray, READ_CHUNK, CONVERT_CHUNK
+
+BASE = 64
+# Blocks summarised by each task of baseRows(); small enough that slicing a VirtualSampleArray
+# for it is converted on the calling thread rather than on a pool of its own
+TASK_BLOCKS = CONVERT_CHUNK // BASE
+
+# Columns of each row
+AMIN, AMAX, POWER, REMIN, REMAX, IMMIN, IMMAX = range(7)
+NUM_COLS = 7
+_MINS = [AMIN, REMIN, IMMIN]
+_MAXS = [AMAX, REMAX, IMMAX]
+
+
+def blockStats(x: np.ndarray, step: int):
+    """
+    Summarises consecutive blocks of step samples; the last block may be shorter.
+
+    Returns
+    -------
+    rows : np.ndarray
+        float32 array of shape (number of blocks, NUM_COLS).
+    """
+    x = np.asarray(x)
+    numFull = x.size // step
+    rows = np.empty((-(-x.size // step), NUM_COLS), dtype=np.float32)
+    if numFull > 0:
+        _fillRows(rows[:numFull], x[:numFull*step].reshape((numFull, step)))
+    if numFull < rows.shape[0]:
+        _fillRows(rows[numFull:], x[numFull*step:].reshape((1, -1)))
+    return rows
+
+
+def baseRows(ydata, b0: int, b1: int, callback=None, workers: int = None):
+    """
+    Level 0 rows for blocks b0 to b1 of ydata (an array or VirtualSampleArray), which is
+    only sliced TASK_BLOCKS blocks at a time, with the slices split across workers threads
+    (all cores by default). If provided, callback(blocksDone, totalBlocks) is called as they finish,
+    in order; if it raises, the slices that haven't started yet are dropped.
+    """
+    rows = np.empty((max(b1 - b0, 0), NUM_COLS), dtype=np.float32)
+
+    def fillRows(c0: int):
+        c1 = min(c0 + TASK_BLOCKS, b1)
+        rows[c0-b0:c1-b0] = blockStats(ydata[c0*BASE:c1*BASE], BASE)
+        return c1
+
+    starts = range(b0, b1, TASK_BLOCKS)
+    if len(starts) <= 1 or workers == 1:
+        for c0 in starts:
+            c1 = fillRows(c0)
+            if callback is not None:
+                callback(c1 - b0, b1 - b0)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        try:
+            for c1 in executor.map(fillRows, starts):
+                if callback is not None:
+                    callback(c1 - b0, b1 - b0)
+        finally:
+            executor.shutdown(cancel_futures=True)
+    return rows
+
+
+def _fillRows(rows: np.ndarray, blocks: np.ndarray):
+    re = blocks.real
+    im = blocks.imag
+    power = re * re + im * im
+    # sqrt is monotonic, so only the extremes need it
+    rows[:, AMIN] = np.sqrt(power.min(axis=1))
+    rows[:, AMAX] = np.sqrt(power.max(axis=1))
+    rows[:, POWER] = power.mean(axis=1)
+    rows[:, REMIN] = re.min(axis=1)
+    rows[:, REMAX] = re.max(axis=1)
+    rows[:, IMMIN] = im.min(axis=1)
+    rows[:, IMMAX] = im.max(axis=1)
+
+
+def combineRows(rows: np.ndarray, counts: np.ndarray):
+    '''Combines several rows (covering counts samples each) into one.'''
+    out = np.empty(NUM_COLS, dtype=np.float32)
+    out[_MINS] = rows[:, _MINS].min(axis=0)
+    out[_MAXS] = rows[:, _MAXS].max(axis=0)
+    out[POWER] = np.sum(rows[:, POWER] * counts) / np.sum(counts)
+    return out
+
+
+class MinMaxPyramid:
+    def __init__(self):
+        self.levels = [GrowableArray(np.float32, (NUM_COLS,))]
+        self.size = 0 # Samples covered, including a trailing partial block
+
+    @classmethod
+    def build(cls, ydata, callback=None):
+        """
+        Builds the pyramid for ydata (an array or VirtualSampleArray) a chunk at a time.
+        If provided, callback(blocksDone, totalBlocks) is called after every chunk.
+        """
+        pyramid = cls()
+        pyramid.extend(ydata, ydata.size, callback)
+        return pyramid
+
+    @classmethod
+    def fromArrays(cls, arrays: dict, size: int):
+        '''Restores a pyramid saved with toArrays() (other keys are ignored), without copying the levels.'''
+        pyramid = cls()
+        pyramid.levels = [GrowableArray.fromArray(arrays[name])
+                          for name in sorted(k for k in arrays if k.startswith('level'))]
+        pyramid.size = size
+        return pyramid
+
+    def toArrays(self):
+        return {'level%02d' % l: lvl.data for l, lvl in enumerate(self.levels)}
+
+    def extend(self, ydata, newSize: int, callback=None):
+        '''
+        Adds the complete blocks of ydata up to newSize that aren't in the pyramid yet, READ_CHUNK
+        samples at a time, so that only the rows of one chunk are held on top of the levels.
+        '''
+        b0, b1 = self.levels[0].size, newSize // BASE
+        rows, l = b1, 0
+        while rows >= 1:
+            if l == len(self.levels):
+                self.levels.append(GrowableArray(np.float32, (NUM_COLS,)))
+            self.levels[l].reserve(rows)
+            rows, l = rows // 2, l + 1
+        chunk = READ_CHUNK // BASE
+        for c0 in range(b0, b1, chunk):
+            c1 = min(c0 + chunk, b1)
+            self.appendBlocks(baseRows(
+                ydata, c0, c1,
+                None if callback is None else lambda done, total, c0=c0: callback(c0 - b0 + done, b1 - b0)))
+        self.size = newSize
+
+    def appendRows(self, rows: np.ndarray, dataSize: int):
+        '''
+        Appends level 0 rows computed elsewhere (see baseRows()) for the next complete blocks of data
+        that is now dataSize samples long. At most one block past them is covered, as a trailing partial
+        block, since the rest of the samples may not have been summarised yet.
+        '''
+        self.appendBlocks(rows)
+        self.size = min(dataSize, (self.levels[0].size + 1) * BASE)
+
+    def appendBlocks(self, rows: np.ndarray):
+        '''Appends level 0 rows, and fills in every level above them that is now complete.'''
+        self.levels[0].append(rows)
+        l = 0
+        while self.levels[l].size >= 2:
+            if l + 1 == len(self.levels):
+                self.levels.append(GrowableArray(np.float32, (NUM_COLS,)))
+            cur, nxt = self.levels[l].data, self.levels[l + 1]
+            done = 2 * nxt.size
+            pairs = cur[done:done + (cur.shape[0] - done) // 2 * 2]
+            if pairs.shape[0] > 0:
+                a, b = pairs[0::2], pairs[1::2]
+                merged = np.empty_like(a)
+                merged[:, _MINS] = np.minimum(a[:, _MINS], b[:, _MINS])
+                merged[:, _MAXS] = np.maximum(a[:, _MAXS], b[:, _MAXS])
+                merged[:, POWER] = (a[:, POWER] + b[:, POWER]) / 2
+                nxt.append(merged)
+            l += 1
+
+    def getEnvelope(self, ydata, i0: int, i1: int, step: int):
+        """
+        Summarises ydata[i0:i1] in blocks of about step samples, using the highest
+        level whose blocks are no longer than step.
+
+        Returns
+        -------
+        starts : np.ndarray
+            Sample index at which each block starts.
+        rows : np.ndarray
+            One row per block, see the column indices at the top of the module.
+        """
+        if step < BASE or self.levels[0].size == 0:
+            # Finer than the pyramid; summarise the samples directly
+            rows = blockStats(ydata[i0:i1], step)
+            return i0 + np.arange(rows.shape[0]) * step, rows
+
+        l = min(int(np.log2(step // BASE)), len(self.levels) - 1)
+        blockLen = BASE << l
+        b0 = i0 // blockLen
+        b1 = -(-min(i1, self.size) // blockLen)
+        numComplete = self.levels[l].size
+        rows = self.levels[l].data[b0:min(b1, numComplete)]
+        if b1 > numComplete and self.size > numComplete * blockLen:
+            rows = np.vstack((rows, self.getPartialRow(ydata, l)))
+        return np.arange(b0, b0 + rows.shape[0]) * blockLen, rows
+
+    def getPartialRow(self, ydata, level: int):
+        '''Row for the trailing partial block at a level, from the leftovers of the levels below.'''
+        parts = []
+        counts = []
+        for l in range(level - 1, -1, -1):
+            # Entries at this level that haven't been merged into the level above
+            lvl = self.levels[l].data
+            for k in range(2 * self.levels[l + 1].size, lvl.shape[0]):
+                parts.append(lvl[k])
+                counts.append(BASE << l)
+        # Then the samples that don't fill a base block yet
+        tail = self.levels[0].size * BASE
+        if self.size > tail:
+            parts.append(blockStats(ydata[tail:self.size], BASE)[0])
+            counts.append(self.size - tail)
+        return combineRows(np.array(parts), np.array(counts, dtype=np.float64))
@@ -0,0 +1,472 @@
+'''
+Loading routines for raw complex sample files.
+
+Files can be memory-mapped instead of read, in which case nothing is pulled
+off the disk until a slice of the samples is actually requested. This lets
+the viewer open multi-GB captures almost instantly. Files read into memory
+can also be kept in their native type (e.g. complex int16), and converted to
+complex64 only when sliced.
+'''
+
+import numpy as np
+import os
+import bisect
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of complex samples converted at a time; small enough to stay in cache
+CONVERT_CHUNK = 1 << 16
+# Number of complex samples read from disk at a time
+READ_CHUNK = 1 << 22
+# Maximum number of files read concurrently
+READ_WORKERS = 8
+
+
+class LoadCancelled(Exception):
+    '''Raised from a progress callback to abort a read.'''
+    pass
+
+
+def countSamples(
+    filepaths: list,
+    fmt: type = np.int16,
+    headersize: int = 0,
+    sampleStart: int = 0,
+    fixedlen: int = -1
+):
+    """
+    Returns the number of complex samples that will be used from each file,
+    taking into account the header, start offset and fixed length (negative for
+    the rest of the file).
+    """
+    itemsize = np.dtype(fmt).itemsize
+    offset = headersize + sampleStart * itemsize * 2
+    counts = []
+    for filepath in filepaths:
+        available = max((os.path.getsize(filepath) - offset) // (itemsize * 2), 0)
+        counts.append(available if fixedlen < 0 else min(available, fixedlen))
+    return counts
+
+
+def convertToComplex64(
+    raw: np.ndarray,
+    out: np.ndarray,
+    swapEndian: bool = False,
+    invSpec: bool = False,
+    scaling: float = 1.0,
+    workers: int = None
+):
+    """
+    Converts interleaved (real, imag) native samples into a preallocated complex64 array.
+
+    The endian swap, type conversion, scaling and spectral inversion are all
+    applied to each cache-sized chunk in one go, so no full-size temporaries
+    are created. Chunks are spread over a thread pool (numpy releases the GIL).
+
+    Parameters
+    ----------
+    raw : np.ndarray
+        Interleaved native array of length 2 * out.size.
+    out : np.ndarray
+        Preallocated complex64 output.
+    swapEndian : bool
+        Interpret the raw samples with the opposite byte order.
+    invSpec : bool
+        Conjugate the output i.e. invert the spectrum.
+    scaling : float
+        Multiplier applied to every component.
+    workers : int
+        Number of threads. Defaults to the number of cores.
+    """
+    if swapEndian:
+        # Reinterpret with the other byte order; the swap then happens during the cast
+        raw = raw.view(raw.dtype.newbyteorder())
+    outf = out.view(np.float32)
+
+    def convertChunk(i0: int):
+        i1 = min(i0 + 2*CONVERT_CHUNK, outf.size)
+        o = outf[i0:i1]
+        np.copyto(o, raw[i0:i1], casting='unsafe')
+        if scaling != 1.0:
+            o *= scaling
+        if invSpec:
+            np.negative(o[1::2], out=o[1::2])
+
+    starts = range(0, outf.size, 2*CONVERT_CHUNK)
+    if len(starts) <= 1 or workers == 1:
+        for i0 in starts:
+            convertChunk(i0)
+    else:
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            list(executor.map(convertChunk, starts))
+
+    return out
+
+
+def _readFiles(
+    filepaths: list,
+    sampleStarts: list,
+    offset: int,
+    readChunk,
+    workers: int = None,
+    callback=None
+):
+    """
+    Reads every file in chunks of READ_CHUNK samples on a bounded thread pool.
+
+    readChunk(fid, pos, n) must read the next n samples from the open file into
+    global sample index pos of whatever output the caller has preallocated.
+    """
+    workers = min(workers or READ_WORKERS, max(len(filepaths), 1))
+    # Shared progress counter for the callback
+    samplesRead = [0]
+    lock = threading.Lock()
+
+    def readFile(i: int):
+        with open(filepaths[i], 'rb') as fid:
+            fid.seek(offset)
+            pos = sampleStarts[i]
+            while pos < sampleStarts[i+1]:
+                n = min(READ_CHUNK, sampleStarts[i+1] - pos)
+                readChunk(fid, pos, n)
+                pos += n
+                if callback is not None:
+                    with lock:
+                        samplesRead[0] += n
+                        done = samplesRead[0]
+                    callback(done, sampleStarts[-1])
+
+    if workers == 1:
+        for i in range(len(filepaths)):
+            readFile(i)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(readFile, range(len(filepaths))))
+
+
+def _cumulativeStarts(counts: list):
+    sampleStarts = [0]
+    for count in counts:
+        sampleStarts.append(sampleStarts[-1] + count)
+    return sampleStarts
+
+
+def readSamples(
+    filepaths: list,
+    fmt: type = np.int16,
+    headersize: int = 0,
+    sampleStart: int = 0,
+    fixedlen: int = -1,
+    swapEndian: bool = False,
+    invSpec: bool = False,
+    scaling: float = 1.0,
+    workers: int = None,
+    callback=None
+):
+    """
+    Reads the files straight into one preallocated complex64 array.
+
+    The offset of each file in the output is known up front from the file sizes,
+    so the files are read concurrently on a bounded thread pool, each straight
+    into its own slot. Every file is read through a scratch buffer of READ_CHUNK
+    samples, so the peak memory is the output plus one chunk per thread.
+
+    Parameters
+    ----------
+    workers : int
+        Maximum number of files read at once. Defaults to READ_WORKERS;
+        use 1 for sequential reads.
+    callback : callable
+        Called as callback(samplesRead, totalSamples) after every chunk, from
+        the reading threads. It may raise (e.g. LoadCancelled) to abort the read.
+
+    Returns
+    -------
+    data : np.ndarray
+        Concatenated complex64 samples.
+    sampleStarts : list of int
+        Index at which each file starts, with the total appended at the end.
+    """
+    counts = countSamples(filepaths, fmt, headersize, sampleStart, fixedlen)
+    sampleStarts = _cumulativeStarts(counts)
+
+    data = np.empty(sampleStarts[-1], dtype=np.complex64)
+    offset = headersize + sampleStart * np.dtype(fmt).itemsize * 2
+    # Only split the conversion over threads if the files aren't already
+    convertWorkers = None if workers == 1 or len(filepaths) <= 1 else 1
+    # Complex float32 files can be read directly into the output
+    inPlace = np.dtype(fmt) == np.float32 and not swapEndian
+    # Each reading thread keeps its own scratch buffer
+    local = threading.local()
+
+    def readChunk(fid, pos: int, n: int):
+        if inPlace:
+            raw = data[pos:pos+n].view(np.float32)
+        else:
+            if getattr(local, 'scratch', None) is None or local.scratch.size < 2*n:
+                local.scratch = np.empty(2*n, dtype=fmt)
+            raw = local.scratch[:2*n]
+        fid.readinto(memoryview(raw))
+        convertToComplex64(raw, data[pos:pos+n], swapEndian, invSpec, scaling,
+                           workers=convertWorkers)
+
+    _readFiles(filepaths, sampleStarts, offset, readChunk, workers, callback)
+
+    return data, sampleStarts
+
+
+def readRawSamples(
+    filepaths: list,
+    fmt: type = np.int16,
+    headersize: int = 0,
+    sampleStart: int = 0,
+    fixedlen: int = -1,
+    workers: int = None,
+    callback=None
+):
+    """
+    Reads the files into one preallocated array of their native type, without
+    any conversion. Complex int16 files then take half the memory of complex64;
+    wrap the returned segments in a VirtualSampleArray to convert on slicing.
+
+    Parameters are as in readSamples.
+
+    Returns
+    -------
+    segments : list of np.ndarray
+        One interleaved (real, imag) view per file into the shared array.
+    """
+    counts = countSamples(filepaths, fmt, headersize, sampleStart, fixedlen)
+    sampleStarts = _cumulativeStarts(counts)
+
+    raw = np.empty(2 * sampleStarts[-1], dtype=fmt)
+    offset = headersize + sampleStart * np.dtype(fmt).itemsize * 2
+
+    def readChunk(fid, pos: int, n: int):
+        fid.readinto(memoryview(raw[2*pos:2*(pos+n)]))
+
+    _readFiles(filepaths, sampleStarts, offset, readChunk, workers, callback)
+
+    return [raw[2*s0:2*s1] for s0, s1 in zip(sampleStarts[:-1], sampleStarts[1:])]
+
+
+def openMemmaps(
+    filepaths: list,
+    fmt: type = np.int16,
+    headersize: int = 0,
+    sampleStart: int = 0,
+    fixedlen: int = -1
+):
+    """
+    Memory-maps each file as an interleaved (real, imag) array of the native type.
+
+    Parameters
+    ----------
+    filepaths : list of str
+        Files to map, in order.
+    fmt : type
+        Native type of each real/imag component e.g. np.int16.
+    headersize : int
+        Number of header bytes to skip in each file.
+    sampleStart : int
+        Number of complex samples to skip after the header.
+    fixedlen : int
+        Maximum number of complex samples to map per file. Negative values map
+        the rest of the file.
+
+    Returns
+    -------
+    maps : list of np.ndarray
+        One interleaved array per file. Files without any samples get an
+        empty in-memory array since np.memmap cannot map zero bytes.
+    """
+    counts = countSamples(filepaths, fmt, headersize, sampleStart, fixedlen)
+    offset = headersize + sampleStart * np.dtype(fmt).itemsize * 2
+    maps = []
+    for filepath, count in zip(filepaths, counts):
+        if count > 0:
+            m = np.memmap(filepath, dtype=fmt, mode='r',
+                          offset=offset, shape=(count * 2,))
+        else:
+            m = np.zeros(0, dtype=fmt)
+        maps.append(m)
+
+    return maps
+
+
+def locateSample(sampleStarts: list, idx):
+    """
+    Finds the file (or segment) containing a global sample index.
+
+    Parameters
+    ----------
+    sampleStarts : list of int
+        Index at which each file starts, with the total appended at the end.
+    idx : int or float
+        Global sample index. Indices outside the data are assigned to the
+        first or last file.
+
+    Returns
+    -------
+    fileIdx : int
+        Index of the file; empty files are never returned unless all are empty.
+    offset : int or float
+        Sample index relative to the start of that file.
+    """
+    fileIdx = bisect.bisect_right(sampleStarts, idx, hi=len(sampleStarts) - 1) - 1
+    fileIdx = max(fileIdx, 0)
+    return fileIdx, idx - sampleStarts[fileIdx]
+
+
+class VirtualSampleArray:
+    '''
+    Read-only, array-like view of complex samples spread over several
+    interleaved (real, imag) segments, usually one memory-map per file.
+
+    Indexing with an integer or a slice returns complex64 values, converting
+    only the requested samples. Slices within a single complex float32 segment
+    that needs no conversion are returned as views instead. np.asarray() on the
+    whole object works too, but will of course read everything.
+    '''
+
+    def __init__(
+        self,
+        segments: list,
+        swapEndian: bool = False,
+        invSpec: bool = False
+    ):
+        self.segments = segments
+        self.swapEndian = swapEndian
+        self.invSpec = invSpec
+
+        # Global start index of each segment (plus the total at the end)
+        self.sampleStarts = [0]
+        for seg in self.segments:
+            self.sampleStarts.append(self.sampleStarts[-1] + seg.size // 2)
+
+    @property
+    def size(self):
+        return self.sampleStarts[-1]
+
+    @property
+    def shape(self):
+        return (self.size,)
+
+    @property
+    def ndim(self):
+        return 1
+
+    @property
+    def dtype(self):
+        return np.dtype(np.complex64)
+
+    def __len__(self):
+        return self.size
+
+    def locate(self, idx: int):
+        """
+        Maps a global sample index to (segment index, offset into the segment).
+        """
+        if idx < 0 or idx >= self.size:
+            raise IndexError("Index %d out of range for %d samples" % (idx, self.size))
+        return locateSample(self.sampleStarts, idx)
+
+    def _isViewable(self, seg: np.ndarray):
+        # Interleaved native float32 is already laid out as complex64
+        return seg.dtype == np.float32 and not self.swapEndian and not self.invSpec
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self._getSlice(*key.indices(self.size))
+
+        # Otherwise treat as a single integer index
+        idx = int(key)
+        if idx < 0:
+            idx += self.size
+        if idx < 0 or idx >= self.size:
+            raise IndexError("Index %d out of range for %d samples" % (key, self.size))
+        return self._getSlice(idx, idx + 1, 1)[0]
+
+    def _getSlice(self, start: int, stop: int, step: int):
+        if step <= 0:
+            raise ValueError("Only positive slice steps are supported")
+        length = len(range(start, stop, step))
+        if length == 0:
+            return np.empty(0, dtype=np.complex64)
+
+        last = start + (length - 1) * step
+        i0, offset = locateSample(self.sampleStarts, start)
+        if last < self.sampleStarts[i0+1] and self._isViewable(self.segments[i0]):
+            # Entirely inside one segment that needs no conversion
+            return np.asarray(self.segments[i0]).view(np.complex64)[offset:offset + (length - 1) * step + 1:step]
+
+        out = np.empty(length, dtype=np.complex64)
+        for i in range(i0, len(self.segments)):
+            seg = self.segments[i]
+            s0, s1 = self.sampleStarts[i], self.sampleStarts[i+1]
+            if s0 > last:
+                break
+            # First global index on the step grid inside this segment
+            first = start if start >= s0 else start + -(-(s0 - start) // step) * step
+            if first >= s1:
+                continue
+            end = min(s1, last + 1)
+            pairs = seg.reshape((-1, 2))[first - s0:end - s0:step]
+            o = (first - start) // step
+            if self._isViewable(seg):
+                out[o:o + pairs.shape[0]] = pairs.view(np.complex64).reshape(-1)
+            else:
+                convertToComplex64(
+                    np.ascontiguousarray(pairs).reshape(-1), out[o:o + pairs.shape[0]],
+                    self.swapEndian, self.invSpec)
+
+        return out
+
+    def __array__(self, dtype=None, copy=None):
+        out = self._getSlice(0, self.size, 1)
+        return out if dtype is None else out.astype(dtype)
+
+
+class GrowableArray:
+    '''
+    Array that is appended to along its first axis, e.g. as a file grows.
+    The capacity doubles whenever it runs out, so appends are amortised O(1)
+    per element and nothing already stored is recomputed.
+    '''
+
+    def __init__(self, dtype, rowshape: tuple = ()):
+        self._buf = np.empty((1024,) + tuple(rowshape), dtype=dtype)
+        self.size = 0
+
+    @classmethod
+    def fromArray(cls, x: np.ndarray):
+        '''Wraps an existing (possibly read-only) array; it is only copied if appended to.'''
+        arr = cls.__new__(cls)
+        arr._buf = x
+        arr.size = len(x)
+        return arr
+
+    @property
+    def data(self):
+        '''View of the valid part; it goes stale once the array grows again.'''
+        return self._buf[:self.size]
+
+    def reserve(self, capacity: int):
+        '''Makes room for capacity rows in one go, when the final size is known up front.'''
+        if capacity > len(self._buf):
+            newbuf = np.empty((capacity,) + self._buf.shape[1:], dtype=self._buf.dtype)
+            newbuf[:self.size] = self._buf[:self.size]
+            self._buf = newbuf
+
+    def append(self, x: np.ndarray):
+        n = self.size + len(x)
+        if n > len(self._buf):
+            self.reserve(max(n, 2 * len(self._buf)))
+        self._buf[self.size:n] = x
+        self.size = n
+
+    def keepEvery(self, step: int):
+        '''Decimates the stored rows in place, keeping rows 0, step, 2*step...'''
+        kept = self._buf[:self.size:step].copy()
+        self._buf[:kept.shape[0]] = kept
+        self.size = kept.shape[0]
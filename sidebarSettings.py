@@ -201,6 +201,9 @@ class SidebarSettings(QFrame):
         # Add a colour slider control
         self.contrastSlider = QSlider(Qt.Horizontal)
         self.contrastSlider.setRange(0, 99)
+        self.contrastSlider.setToolTip(
+            "Saturates this percentage of the strongest power in view."
+        )
         self.speclayout.addRow("Contrast", self.contrastSlider)
         # Connection
         self.contrastSlider.valueChanged.connect(self.changeSpecgramContrast)
@@ -0,0 +1,147 @@
+import sqlite3 as sq
+import numpy as np
+import os
+import shutil
+import hashlib
+import json
+import time
+
+'''
+Sidecar cache for the products derived from a set of loaded files (the amplitude pyramid
+and the spectrogram), so that reopening a capture with the same settings doesn't rebuild them.
+
+Each entry is a directory in the cache directory, named by the hash of its key, with one
+.npy file per array; these are memory-mapped when the entry is loaded. The entries are
+indexed in the 'sidecars' table of cache.db, next to the file statistics:
+'key, nbytes, lastAccess, scalars'.
+The scalars are stored as JSON, and lastAccess is used to evict the least recently
+used entries once the total size goes over the budget. An entry whose files can't be deleted
+yet (on Windows, while they are still memory-mapped by the view) keeps its row, and counts
+towards the budget, until a later eviction manages to delete them.
+'''
+
+DEFAULT_BUDGET_GB = 10
+
+
+class SidecarCache:
+    def __init__(self, dirpath="sidecars", dbpath="cache.db", budget=DEFAULT_BUDGET_GB * 2**30):
+        self.dirpath = dirpath
+        self.budget = budget
+        self.con = sq.connect(dbpath)
+        self.cur = self.con.cursor()
+        self.initTable()
+
+    def initTable(self):
+        self.cur.execute(
+            "create table if not exists sidecars("
+            "key TEXT PRIMARY KEY, nbytes INTEGER, lastAccess REAL, scalars TEXT)")
+        self.con.commit()
+
+    @staticmethod
+    def makeKey(filepaths: list, filesettings: dict, procsettings: dict):
+        """
+        Hashes the identity of the files (path, size and mtime) together with the
+        settings used to read and process them.
+
+        Returns
+        -------
+        key : str
+            Or None if there are no files, or one of them no longer exists.
+        """
+        if len(filepaths) == 0:
+            return None
+        identity = []
+        for filepath in filepaths:
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                return None
+            identity.append((os.path.realpath(filepath), st.st_size, st.st_mtime_ns))
+
+        settings = dict(filesettings, **procsettings)
+        if 'fmt' in settings:
+            settings['fmt'] = np.dtype(settings['fmt']).name
+        return hashlib.sha1(repr((identity, sorted(settings.items()))).encode()).hexdigest()
+
+    def entryPath(self, key: str):
+        return os.path.join(self.dirpath, key)
+
+    def load(self, key: str):
+        """
+        Returns
+        -------
+        arrays : dict
+            Memory-mapped (read-only) arrays of the entry.
+        scalars : dict
+            The scalars saved with them.
+
+        Both are None if the entry isn't cached.
+        """
+        self.cur.execute("select scalars from sidecars where key=?", (key,))
+        r = self.cur.fetchone()
+        if r is None:
+            return None, None
+
+        try:
+            path = self.entryPath(key)
+            arrays = {
+                os.path.splitext(f)[0]: np.load(os.path.join(path, f), mmap_mode='r')
+                for f in os.listdir(path)
+            }
+        except (OSError, ValueError):
+            # Removed or damaged from outside, so forget about it
+            self.remove(key)
+            return None, None
+
+        self.cur.execute("update sidecars set lastAccess=? where key=?", (time.time(), key))
+        self.con.commit()
+        return arrays, json.loads(r[0])
+
+    def save(self, key: str, arrays: dict, scalars: dict):
+        '''Saves an entry, then evicts the least recently used ones that no longer fit in the budget.'''
+        nbytes = sum(a.nbytes for a in arrays.values())
+        if nbytes > self.budget:
+            print("Not caching %d bytes, over the budget of %d bytes" % (nbytes, self.budget))
+            return
+
+        # Written to a temporary directory first, so a partial entry is never loaded
+        path = self.entryPath(key)
+        tmppath = path + ".tmp"
+        shutil.rmtree(tmppath, ignore_errors=True)
+        os.makedirs(tmppath)
+        for name, a in arrays.items():
+            np.save(os.path.join(tmppath, name + ".npy"), a)
+        shutil.rmtree(path, ignore_errors=True)
+        if os.path.exists(path):
+            # Still in use, so it can't be replaced now
+            print("Not caching sidecar %s, its previous files are still in use" % (key))
+            shutil.rmtree(tmppath, ignore_errors=True)
+            return
+        os.replace(tmppath, path)
+
+        self.cur.execute("insert or replace into sidecars values(?,?,?,?)",
+                         (key, nbytes, time.time(), json.dumps(scalars)))
+        self.con.commit()
+        self.evict()
+
+    def remove(self, key: str):
+        '''Deletes an entry, unless its files are still in use; returns whether it was deleted.'''
+        path = self.entryPath(key)
+        shutil.rmtree(path, ignore_errors=True)
+        if os.path.exists(path):
+            # Keep the row, so that the files are still accounted for and deleted later
+            return False
+        self.cur.execute("delete from sidecars where key=?", (key,))
+        self.con.commit()
+        return True
+
+    def evict(self):
+        self.cur.execute("select key, nbytes from sidecars order by lastAccess desc")
+        total = 0
+        for key, nbytes in self.cur.fetchall():
+            if total + nbytes > self.budget:
+                print("Evicting sidecar %s" % (key))
+                if self.remove(key):
+                    continue
+                print("Sidecar %s is still in use, so it is evicted later" % (key))
+            total += nbytes
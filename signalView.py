@@ -1,11 +1,11 @@
 from PySide6.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout
-from PySide6.QtWidgets import QPushButton, QLabel, QLineEdit, QApplication, QMenu, QInputDialog, QMessageBox, QSlider
-from PySide6.QtCore import Qt, Signal, Slot, QRectF, QEvent
+from PySide6.QtWidgets import QPushButton, QLabel, QLineEdit, QApplication, QMenu, QInputDialog, QMessageBox, QSlider, QProgressBar
+from PySide6.QtCore import Qt, Signal, Slot, QRectF, QEvent, QThread, QMutex, QMutexLocker, QWaitCondition
 import pyqtgraph as pg
 from pyqtgraph.exporters import ImageExporter
 import numpy as np
-import scipy.signal as sps
 import platform
+from collections import OrderedDict
 
 from fftWindow import FFTWindow
 from estBaudWindow import EstimateBaudWindow
@@ -16,16 +16,27 @@ from demodWindow import DemodWindow
 from phasorWindow import PhasorWindow
 
 from markerdb import MarkerDB
+from sampleLoader import VirtualSampleArray, locateSample, countSamples, openMemmaps, convertToComplex64, GrowableArray
+from dsp import stftWindow, segmentPowers
+from dsp import powerHistogram, histogramPercentile, HIST_GROUP_COLUMNS, movingAverages
+from pyramid import MinMaxPyramid, baseRows, BASE, AMIN, AMAX, REMIN, REMAX, IMMIN, IMMAX
+from sidecar import SidecarCache, DEFAULT_BUDGET_GB
+from specTiles import SpecgramTiles
+from processingChain import ProcessingChain
 
 import time
 
 class SignalView(QFrame):
     VIEW_BUFFER_FRACTION = 0.05
+    SLICE_CACHE_SIZE = 16 # Slices of the time plot kept for when the view moves onto them
+    SPEC_TARGET_COLUMNS = 2048 # Spectrogram tiles are picked to show about this many columns
+    SPEC_DB_RANGE = 100 # Power below the maximum (dB) that the spectrogram image can show
 
     AMPL_PLOT = 0
     REIM_PLOT = 1
     SignalViewStatusTip = Signal(str)
     DataSelectionSignal = Signal(list, list, np.ndarray)
+    followStoppedSignal = Signal()
 
     lower, target, upper = (5000, 10000, 20000) # This is the lower bound, target, and upper bounds for sample slicing
 
@@ -62,6 +73,22 @@ class SignalView(QFrame):
         self.sxxMax = None # For image control
         self.specFreqRes = None
         self.specTimeRes = None # For spectrogram point-finding
+        self.specStride = 1 # Number of hops between columns; only more than 1 when following
+        self.specPercentile = 1.0 # Current contrast/log view, reapplied when following
+        self.specLog = False
+        self.specTiles = None # Finer tiles than the overview in sxx, computed when zoomed in
+        self.specView = None # (level, first tile, last tile) shown, or None for the overview
+        self.specImage = None # Linear image of the shown tiles
+        # The image is shown as uint8 codes spread over a range of dB; the log/linear scale and
+        # the contrast are all applied by the lookup table, so changing them is cheap
+        self.specCodes = None # Codes of the overview
+        self.specCodesRange = None # The (min, max) dB the codes were made with
+        self.specColours = pg.colormap.get('viridis').getLookupTable(nPts=256) # you don't need matplotlib to use viridis!
+        # Contrast is set by percentiles of the visible power, from histograms per group of columns
+        self.specHist = None # Histograms of the overview
+        self.specTileHist = None # Histogram of the shown tiles
+        self.specVisibleHist = None # Histogram the levels are taken from
+        self.specVisibleKey = None # (view, first group, last group) it was summed over
 
         # Create a graphics view
         self.glw = pg.GraphicsLayoutWidget() # Window for the amplitude time plot
@@ -120,9 +147,44 @@ class SignalView(QFrame):
         self.specPowerLabel = QLabel()
         self.viewboxLabelsLayout.addWidget(self.specPowerLabel)
         self.p1.sigRangeChanged.connect(self.onZoom)
+        self.spw.sigXRangeChanged.connect(self.onSpecgramZoom) # Swaps in finer spectrogram tiles
+
+        # Progress of the background processing (only shown while running)
+        self.processingProgressLayout = QHBoxLayout()
+        self.processingLabel = QLabel()
+        self.processingProgressBar = QProgressBar()
+        self.processingProgressBar.setRange(0, 100)
+        self.processingCancelBtn = QPushButton("Cancel")
+        self.processingCancelBtn.clicked.connect(self.cancelProcessing)
+        self.processingProgressLayout.addWidget(self.processingLabel)
+        self.processingProgressLayout.addWidget(self.processingProgressBar)
+        self.processingProgressLayout.addWidget(self.processingCancelBtn)
+        self.processingWorker = None
+
+        # Placeholders for following a growing file
+        self.tailWorker = None
+        self.liveSxx = None
+        self.liveCodes = None # Codes of liveSxx, made with the (min, max) dB in liveCodesRange
+        self.liveCodesRange = None
+
+        # Slices and spectrogram tiles are computed in the background when the view moves
+        self.resliceWorker = ResliceWorker(parent=self)
+        self.resliceWorker.curvesReady.connect(self.onCurvesReady)
+        self.resliceWorker.tilesReady.connect(self.onTilesReady)
+        self.resliceWorker.slicePrefetched.connect(self.onSlicePrefetched)
+        self.resliceWorker.start()
+        self.resliceId = 0 # Latest slice requested
+        self.resliceApplied = 0 # Latest slice shown; older ones are always dropped
+        self.specPendingView = None # Tiles requested but not shown yet
+        # Slices that the view is likely to move onto next are computed ahead of time
+        self.sliceCache = OrderedDict() # (idx0, idx1, skip, reim) -> (t, ys, ymin, ymax)
+        self.sliceGeneration = 0 # Changes whenever the data does, so older slices are dropped
+        self.lastXRange = None
+        self.viewMotion = (0.0, 1.0, None) # Last pan (s), zoom ratio, and the time the zoom is about
 
         # Create the main layout
         self.layout = QVBoxLayout()
+        self.layout.addLayout(self.processingProgressLayout)
         self.layout.addLayout(self.linearRegionLabelsLayout)
         self.layout.addLayout(self.viewboxLabelsLayout)
         self.layout.addWidget(self.glw)
@@ -132,16 +194,26 @@ class SignalView(QFrame):
         # DSP Settings
         self.nperseg = 256
         self.noverlap = 256/8
+        self.specMaxHold = False # Max-hold (instead of average) the segments combined into a column
         self.fs = 1
         self.fc = 0
         self.freqshift = None
         self.numTaps = None
         self.filtercutoff = None
         self.dsr = None
+        self.lazyProcessing = False # Only process the samples that are viewed or analysed
+
+        # Disk budget (GB) for the sidecar cache of pyramids and spectrograms
+        self.cacheBudget = DEFAULT_BUDGET_GB
+
+        # Outputs of each processing stage, kept so that a change of settings only recomputes what depends on it
+        self.chain = ProcessingChain()
+        self.filesettings = None
 
         # Placeholders for SMAs
-        self.smas = {} # Save complex SMA
+        self.smas = {} # Length -> (SMA, its pyramid), or None while it is computed
         self.smaplots = {}
+        self.smaWorker = None
 
         # Placeholders for plot types
         self.plotType = self.AMPL_PLOT # 0: amp, 1: reim
@@ -151,6 +223,11 @@ class SignalView(QFrame):
 
         # Placeholder for time vector
         self.timevec = None
+
+        # Placeholder for the min/max overview of ydata
+        self.pyramid = None
+        # Samples that the pyramid summarises, if not ydata: the unprocessed grid when processing lazily
+        self.overview = None
         
         # Placeholders for viewbox tracking
         self.idx0 = 0
@@ -162,6 +239,7 @@ class SignalView(QFrame):
         for widgetItem in widgetChildren:
             if widgetItem.widget() is not None: # Spacer item returns None
                 widgetItem.widget().hide()
+        self.showProcessingProgress(False)
 
 
 
@@ -185,17 +263,53 @@ class SignalView(QFrame):
 
     @Slot(int)
     def addSma(self, length: int):
-        taps = np.ones(length)/length
-        sma = np.convolve(taps, np.abs(self.ydata), 'same')
-        self.smas[length] = sma
-        # Add to plot
+        if self.timevec is None:
+            return # Still processing
+        self.smas[length] = None
+        # Add to plot; it is filled in once computed, and then resliced like the amplitude
         self.smaplots[length] = pg.PlotDataItem(
-            np.arange(self.ydata.size) / self.fs,
-            np.abs(sma),
             pen='r' # Default colour
         )
         self.p1.addItem(self.smaplots[length])
-        
+        self.smaplots[length].setClipToView(True)
+        self.startSmaWorker()
+
+    def startSmaWorker(self):
+        '''Computes the SMAs waiting for one, all in the same pass, unless a pass is already running.'''
+        if self.smaWorker is not None and self.smaWorker.isRunning():
+            return # The lengths added meanwhile go in the next pass
+        lengths = [length for length, sma in self.smas.items() if sma is None]
+        if len(lengths) == 0:
+            return
+        self.smaWorker = MovingAverageWorker(self.ydata, lengths, parent=self)
+        self.smaWorker.smasReady.connect(self.onSmasReady)
+        self.smaWorker.finished.connect(self.startSmaWorker)
+        self.smaWorker.start()
+
+    def cancelSmas(self):
+        if self.smaWorker is not None:
+            self.smaWorker.requestInterruption()
+            self.smaWorker.wait()
+            self.smaWorker = None
+
+    @Slot(object, object)
+    def onSmasReady(self, ydata, results):
+        if self.sender() is not self.smaWorker or ydata is not self.ydata:
+            return # For data that has since been replaced
+        for length, sma in results.items():
+            if length in self.smas: # Unless deleted while it was computed
+                self.smas[length] = sma
+                self.smaplots[length].setData(*self.getSmaCurve(length))
+        self.invalidateSlices() # Slices computed so far don't have these SMAs
+
+    def getSmaCurve(self, length: int):
+        sma, pyramid = self.smas[length]
+        t, (y,) = ResliceWorker.curves(sma, pyramid, self.timevec, self.idx0, self.idx1, self.skip, False)
+        return t, y
+
+    def getSmaSources(self):
+        '''(length, SMA, pyramid) of the SMAs that are ready, for the reslicing.'''
+        return tuple((length, *sma) for length, sma in self.smas.items() if sma is not None)
 
     @Slot(int)
     def delSma(self, length: int):
@@ -204,7 +318,6 @@ class SignalView(QFrame):
         # And from internal memory
         self.smaplots.pop(length)
         self.smas.pop(length)
-        
 
     @Slot(int, int, int, int)
     def colourSma(self, length: int, r: int, g: int, b: int):
@@ -212,33 +325,30 @@ class SignalView(QFrame):
         
     @Slot(float, bool)
     def adjustSpecgramContrast(self, percentile: float, isLog: bool):
+        self.specPercentile = percentile
+        self.specLog = isLog
         if self.sxxMax is not None:
-            maxval = np.log10(self.sxxMax * percentile) if isLog else self.sxxMax * percentile
-            minval = np.log10(self.sxxMin) if isLog else 0
             t1 = time.time()
-            self.sp.setLevels([minval, maxval])
+            self.sp.setLookupTable(self.getSpecgramLut())
             t2 = time.time()
             print("Took %f seconds to set contrast" % (t2-t1))
 
     @Slot(float)
     def adjustSpecgramLog(self, isLog: bool):
-        if isLog and self.sxx is not None:
-            self.sp.setImage(np.log10(self.sxx))
-            self.sp.setLevels([
-                np.log10(self.sxxMin),
-                np.log10(self.sxxMax)])
-        elif self.sxx is not None:
-            self.sp.setImage(self.sxx)
-            self.sp.setLevels([0, self.sxxMax])
+        self.specLog = isLog
+        self.specPercentile = 1.0 # The sidebar resets the contrast too
+        if self.sxxMax is not None:
+            self.sp.setLookupTable(self.getSpecgramLut())
 
     def loadMarkers(self):
         sfilepaths, samplestarts, labels = self.markerdb.getMarkers(self.filelist)
 
+        fileIndices = {filepath: i for i, filepath in enumerate(self.filelist)}
         loadedsamples = []
         loadedlabels = []
         for i in range(len(sfilepaths)):
-            si = self.filelist.index(sfilepaths[i])
-            normalizedSample = (samplestarts[i] + self.sampleStarts[si]) / self.fs  # offset by file
+            si = fileIndices[sfilepaths[i]]
+            normalizedSample = self.sampleToTime(samplestarts[i] + self.sampleStarts[si])  # offset by file
             print("normalized sample = %f " % (normalizedSample))
             loadedsamples.append(normalizedSample)
             loadedlabels.append(labels[i])
@@ -246,71 +356,342 @@ class SignalView(QFrame):
         # Add the lines
         self.addMarkerLines(loadedsamples, loadedlabels)
 
+    def sampleToTime(self, sample):
+        '''Time on the x-axis of a sample at the original fs, which is what files and markers count in.'''
+        return float(self.timevec.times(sample * self.getDisplayedFs() / self.fs))
+
+    def timeToSample(self, t: float):
+        '''Sample at the original fs (fractional) at a time on the x-axis.'''
+        return self.timevec.indexAt(t) * self.fs / self.getDisplayedFs()
+
     def getDisplayedFs(self):
         # This is usually the fs value used in all functions, other than the preprocessing steps
         # and the marker values (which are normalised)
         return self.fs if self.dsr is None else self.fs/self.dsr
 
-    def setYData(self, ydata, filelist, sampleStarts):
+    def setYData(self, ydata, filelist, sampleStarts, filesettings: dict = None):
         """
         This is the main method from the main script, which is called whenever files are loaded.
         It performs all necessary pre-processing, clears old plots, and renders the new data.
 
         Parameters
         ----------
-        ydata : np.ndarray
-            Complex data to be viewed.
+        ydata : np.ndarray or VirtualSampleArray
+            Complex data to be viewed. Lazily loaded (memory-mapped) data is
+            only read as it is sliced.
         filelist : list of str
             Filelist that was loaded. This is used for marker labels which are
             tagged to file/sample pairs.
         sampleStarts : list of int
             List of sample start values for each file. This is also used for marker
             label calculations.
+        filesettings : dict, optional
+            Settings the files were read with. If provided, the pyramid and the
+            spectrogram are cached in (and reloaded from) the sidecar cache.
         """
+        # Stop any processing of the previous data
+        self.stopFollowing()
+        self.cancelProcessing()
+
+        self.resetPlots()
+        self.ydata = ydata
+        self.timevec = None # Nothing is plotted until the worker returns
+        self.pyramid = None
+        self.overview = None
+
+        self.filelist = filelist
+        self.sampleStarts = sampleStarts
+        self.filesettings = filesettings
+
+        # The same files keep the stages already computed from them
+        if self.chain.setSource(ydata, filelist, filesettings):
+            ydata = self.chain.getSource()
+
+        # Pre-processing and the spectrogram are computed in the background
+        self.processingWorker = SignalProcessingWorker(
+            ydata, self.fs, self.fc, self.freqshift, self.numTaps, self.filtercutoff,
+            self.dsr, self.nperseg, self.noverlap, maxHold=self.specMaxHold,
+            filelist=filelist, filesettings=filesettings, cacheBudget=self.cacheBudget,
+            chain=self.chain, lazy=self.lazyProcessing, parent=self)
+        self.processingWorker.stageProgress.connect(self.onProcessingProgress)
+        self.processingWorker.ampReady.connect(self.onAmpReady)
+        self.processingWorker.specgramReady.connect(self.onSpecgramReady)
+        self.processingWorker.specgramRefined.connect(self.onSpecgramRefined)
+        self.processingWorker.finished.connect(self.onProcessingFinished)
+        self.processingProgressBar.setValue(0)
+        self.showProcessingProgress(True)
+        self.processingWorker.start()
+
+    def isLoaded(self, filelist: list, filesettings: dict):
+        '''Whether the files, read with these settings, are the ones being viewed.'''
+        return (self.chain.sourceKey is not None
+                and self.chain.sourceKey == ProcessingChain.makeSourceKey(None, filelist, filesettings))
+
+    def reprocess(self):
+        '''Processes the data being viewed again with the current settings, without reading it again.'''
+        self.setYData(self.chain.getSource(), self.filelist, self.sampleStarts, self.filesettings)
+
+    def resetPlots(self):
         # Reset SMA plots
+        self.cancelSmas()
         self.smaplots.clear()
         self.smas.clear()
 
         self.p1.clear()
         self.spw.clear()
+        self.specStride = 1
+        self.specTiles = None
+        self.specView = None
+        self.specImage = None
+        self.specCodes = None
+        self.specHist = None
+        self.specTileHist = None
+        self.specVisibleHist = None
+        self.specVisibleKey = None
+        self.specPendingView = None
+        self.invalidateSlices()
+
+    def invalidateSlices(self):
+        '''Drops the cached slices and anything still being computed for the time plot.'''
+        self.sliceGeneration += 1
+        self.sliceCache.clear()
+        self.resliceApplied = self.resliceId
+        self.lastXRange = None
+        self.resliceWorker.prefetchAhead('curves', [])
+        self.resliceWorker.prefetchAhead('tiles', [])
+
+    @Slot(str, dict)
+    def followFile(self, filepath: str, filesettings: dict):
+        """
+        Follows a capture that is still being written. Only the newly appended
+        samples are read at each poll; the amplitude plot and the spectrogram are
+        extended with them, and the view keeps scrolling if it is at the end.
+
+        Parameters
+        ----------
+        filepath : str
+            File to follow.
+        filesettings : dict
+            File format settings, with keys fmt, headersize, sampleStart,
+            swapEndian and invSpec.
+        """
+        if self.freqshift is not None or self.numTaps is not None or self.dsr is not None:
+            QMessageBox.warning(self, "Follow Error",
+                                "Following a file is not supported with pre-processing (frequency shift, filter or downsampling).",
+                                QMessageBox.Ok)
+            self.followStoppedSignal.emit()
+            return
+
+        self.stopFollowing()
+        self.cancelProcessing()
+
+        self.resetPlots()
+        self.chain.clear() # Nothing it holds is being viewed any more
+        self.p = None
+        self.ydata = np.zeros(0, dtype=np.complex64)
+        self.timevec = None
+        self.pyramid = MinMaxPyramid() # Extended with the rows computed by the worker
+        self.overview = None
+        self.filelist = [filepath]
+        self.sampleStarts = [0, 0]
+        self.freqs = self.ts = self.sxx = None
+        self.sxxMax = self.sxxMin = None
+
+        # Spectrogram columns are stored as rows, so that they can be appended
+        self.liveSxx = GrowableArray(np.float32, (self.nperseg,))
+        self.liveCodes = GrowableArray(np.uint8, (self.nperseg,))
+        self.liveCodesRange = None
+
+        self.tailWorker = LiveTailWorker(
+            filepath, filesettings, self.fs, self.nperseg, self.noverlap, parent=self)
+        self.tailWorker.samplesAppended.connect(self.onLiveSamples)
+        self.tailWorker.start()
+
+    @Slot()
+    def stopReslicing(self):
+        self.resliceWorker.stop()
+
+    def stopFollowing(self):
+        if self.tailWorker is not None:
+            self.tailWorker.requestInterruption()
+            self.tailWorker.wait()
+            self.tailWorker = None
+            self.followStoppedSignal.emit()
+
+    @Slot(object, object, int, object)
+    def onLiveSamples(self, ydata, sxxCols, stride, rows):
+        if self.sender() is not self.tailWorker:
+            return # Queued from a stopped worker
+        dfs = self.getDisplayedFs()
+        oldSize = self.ydata.size
+
+        # Extend the spectrogram with the new part only
+        if stride > self.specStride:
+            # The worker has coarsened the column grid, so drop the columns not on it
+            self.liveSxx.keepEvery(stride // self.specStride)
+            self.liveCodes.keepEvery(stride // self.specStride)
+            self.specStride = stride
+        if sxxCols.shape[1] > 0:
+            self.liveSxx.append(sxxCols.T)
+            self.sxxMax = float(np.max(sxxCols)) if self.sxxMax is None else max(self.sxxMax, float(np.max(sxxCols)))
+            self.sxxMin = float(np.min(sxxCols)) if self.sxxMin is None else min(self.sxxMin, float(np.min(sxxCols)))
+
+            # Only the new columns need quantizing, unless the range of power has changed
+            dbRange = self.getSpecgramDbRange()
+            if dbRange == self.liveCodesRange:
+                self.liveCodes.append(self.quantizeSpecgram(sxxCols.T))
+            else:
+                self.liveCodes = GrowableArray(np.uint8, (self.nperseg,))
+                self.liveCodes.append(self.quantizeSpecgram(self.liveSxx.data))
+                self.liveCodesRange = dbRange
+
         self.ydata = ydata
+        self.timevec = TimeVector(ydata.size, dfs) # A growing full-length vector wouldn't fit
+        oldCovered = self.pyramid.size
+        self.pyramid.appendRows(rows, ydata.size)
+        self.sampleStarts = [0, ydata.size]
+
+        if self.liveSxx.size > 0:
+            self.sxx = self.liveSxx.data.T
+            self.specCodes = self.liveCodes.data.T
+            self.specCodesRange = self.liveCodesRange
+            hop = self.nperseg - self.noverlap
+            self.ts = (np.arange(self.liveSxx.size) * self.specStride * hop + self.nperseg/2) / dfs
+            if self.freqs is None:
+                self.freqs = np.fft.fftshift(np.fft.fftfreq(self.nperseg, 1/dfs)) + self.fc
+                self.plotSpecgram()
+            else:
+                self.specTimeRes = self.specStride * hop / dfs
+                self.refreshSpecgramImage(self.getSpecgramRect())
+
+        if oldSize == 0:
+            # First samples; set up the amplitude plot as usual
+            self.loadMarkers()
+            self.plotAmpTime()
+            self.p1.getAxis('left').setWidth(60)
+            self.spw.getAxis('left').setWidth(60)
+            self.p1.setXLink(self.spw)
+            return
+
+        # Extend the limits, and keep the newest samples in view if we were at the end
+        viewBufferX = self.VIEW_BUFFER_FRACTION * ydata.size / dfs
+        self.p1.setLimits(xMin = -viewBufferX, xMax = ydata.size / dfs + viewBufferX)
+        self.spw.setLimits(xMin = -viewBufferX, xMax = ydata.size / dfs + viewBufferX)
+        self.idx1 = min(self.idx1, oldCovered) # The new samples (and envelope) must be resliced in
+        self.invalidateSlices()
+        xstart, xend = self.p1.viewRange()[0]
+        if xend >= oldSize / dfs:
+            if xstart <= 0:
+                self.p1.vb.setXRange(-viewBufferX, ydata.size / dfs + viewBufferX, padding=0)
+            else:
+                shift = (ydata.size - oldSize) / dfs
+                self.p1.vb.setXRange(xstart + shift, xend + shift, padding=0)
+        self.onZoom()
 
-        # Apply initial processing
-        if self.freqshift is not None:
-            print("Initial freqshift..")
-            t1 = time.time()
-            tone = np.exp(1j*2*np.pi*self.freqshift*np.arange(ydata.size)/self.fs)
-            t2 = time.time()
-            print("Tone gen: %fs.\n" % (t2-t1))
-            self.ydata = self.ydata * tone
-            t3 = time.time()
-            print("Tone mul: %fs.\n" % (t3-t2))
-        
-        if self.numTaps is not None:
-            print("Initial filter..")
-            taps = sps.firwin(self.numTaps, self.filtercutoff/self.fs)
-            t1 = time.time()
-            self.ydata = sps.lfilter(taps,1,self.ydata)
-            t2 = time.time()
-            print("Filter: %fs.\n" % (t2-t1))
+    def getSpecgramLevels(self):
+        if self.specVisibleHist is None:
+            lo, hi = self.sxxMin, self.sxxMax * self.specPercentile
+        else:
+            # Percentiles of what is visible, so one strong carrier doesn't wash out everything else
+            lo = histogramPercentile(self.specVisibleHist, 0)
+            hi = histogramPercentile(self.specVisibleHist, self.specPercentile)
+        if self.specLog:
+            dbMin = self.getSpecgramDbRange()[0]
+            return [np.log10(lo) if lo > 0 and np.log10(lo) > dbMin / 10 else dbMin / 10, np.log10(hi)]
+        return [0, hi]
+
+    def getSpecgramDbRange(self):
+        '''Range of power (dB) spread over the 256 codes of the spectrogram image.'''
+        dbMax = 10 * np.log10(self.sxxMax) if self.sxxMax > 0 else 0.0
+        dbMin = 10 * np.log10(self.sxxMin) if self.sxxMin > 0 else -np.inf
+        dbMin = max(dbMin, dbMax - self.SPEC_DB_RANGE)
+        return dbMin, max(dbMax, dbMin + 1e-3)
+
+    def quantizeSpecgram(self, image: np.ndarray):
+        '''uint8 codes of the power in image, evenly spaced in dB over getSpecgramDbRange().'''
+        dbMin, dbMax = self.getSpecgramDbRange()
+        scale = 10 * 255 / (dbMax - dbMin)
+        with np.errstate(divide='ignore'):
+            codes = np.log10(image, dtype=np.float32)
+        codes *= scale
+        codes -= dbMin / 10 * scale
+        np.clip(codes, 0, 255, out=codes)
+        return np.rint(codes, out=codes).astype(np.uint8)
+
+    def getSpecgramLut(self):
+        '''Colours of the 256 codes, for the current log/linear scale and contrast.'''
+        dbMin, dbMax = self.getSpecgramDbRange()
+        db = np.linspace(dbMin, dbMax, 256)
+        values = db / 10 if self.specLog else 10**(db / 10)
+        lo, hi = self.getSpecgramLevels()
+        idx = np.clip((values - lo) / max(hi - lo, np.finfo(np.float64).tiny) * 255, 0, 255)
+        return self.specColours[idx.astype(np.intp)]
+
+    def getSpecgramCodes(self):
+        '''Codes of the overview, only quantized again if it or its range of power changed.'''
+        dbRange = self.getSpecgramDbRange()
+        if self.specCodes is None or self.specCodesRange != dbRange:
+            self.specCodes = self.quantizeSpecgram(self.sxx)
+            self.specCodesRange = dbRange
+        return self.specCodes
+
+    def refreshSpecgramImage(self, rect: QRectF = None):
+        '''Shows the overview or the tiles in specView as codes, with a matching lookup table.'''
+        codes = self.getSpecgramCodes() if self.specView is None else self.quantizeSpecgram(self.specImage)
+        self.sp.setLookupTable(self.getSpecgramLut(), update=False)
+        if rect is None:
+            self.sp.setImage(codes, levels=None)
+        else:
+            self.sp.setImage(codes, levels=None, rect=rect)
+
+    def getSpecgramRect(self):
+        tspan = self.ts[-1] - self.ts[0]
+        fspan = self.freqs[-1] - self.freqs[0]
+        return QRectF(
+            self.ts[0]-self.specTimeRes/2,
+            self.freqs[0]-self.specFreqRes/2,
+            tspan+self.specTimeRes,
+            fspan+self.specFreqRes)
+
+    @Slot()
+    def cancelProcessing(self):
+        if self.processingWorker is not None:
+            self.processingWorker.requestInterruption()
+            self.processingWorker.wait()
+            self.processingWorker = None
+        self.showProcessingProgress(False)
+
+    def showProcessingProgress(self, show: bool):
+        for widget in (self.processingLabel, self.processingProgressBar, self.processingCancelBtn):
+            widget.setVisible(show)
+
+    @Slot(str, int)
+    def onProcessingProgress(self, stage: str, percent: int):
+        self.processingLabel.setText(stage)
+        self.processingProgressBar.setValue(percent)
 
-        if self.dsr is not None:
-            self.ydata = self.ydata[::self.dsr]
-            print("Using displayed fs %d" % (self.getDisplayedFs()))
+    @Slot()
+    def onProcessingFinished(self):
+        if self.sender() is not self.processingWorker:
+            return # Queued from a cancelled worker, which must not hide the new one's progress
+        self.showProcessingProgress(False)
+
+    @Slot(object, object, object)
+    def onAmpReady(self, ydata, pyramid, overview):
+        if self.sender() is not self.processingWorker:
+            return # Queued from a cancelled worker
+        self.ydata = ydata
+        self.pyramid = pyramid
+        self.overview = None if overview is ydata else overview
 
         # Define the time vector
         print('displayedFs = %d' % (self.getDisplayedFs()))
-        self.timevec = np.arange(0, self.ydata.size) / self.getDisplayedFs()
-        
-        self.filelist = filelist
-        self.sampleStarts = sampleStarts
+        self.timevec = TimeVector(self.ydata.size, self.getDisplayedFs()) # Only the plotted slices are generated
 
         self.loadMarkers()
 
         self.plotAmpTime()
         print("Completed plotAmpTime()")
-        self.plotSpecgram()
-        print("Completed plotSpecgram()")
 
         # Equalize the widths of the y-axis?
         self.p1.getAxis('left').setWidth(60) # Hardcoded for now
@@ -319,6 +700,143 @@ class SignalView(QFrame):
         # Link axes
         self.p1.setXLink(self.spw)
 
+    @Slot(object, object, object, object, object, object, float, float, int)
+    def onSpecgramReady(self, ydata, specSource, freqs, ts, sxx, hist, sxxMax, sxxMin, stride):
+        if self.sender() is not self.processingWorker:
+            return # Queued from a cancelled worker
+        self.ydata = ydata # May come before onAmpReady()
+        self.freqs = freqs
+        self.ts = ts
+        self.sxx = sxx
+        self.sxxMax = sxxMax
+        self.sxxMin = sxxMin
+        self.specStride = stride
+        self.specHist = hist
+        self.specVisibleHist = hist.sum(axis=0) # Starts zoomed out
+        self.specVisibleKey = None
+
+        # The overview averages stride segments per column; finer levels are computed when zoomed in,
+        # from the same samples (the unprocessed grid when processing lazily)
+        if stride > 1:
+            self.specTiles = SpecgramTiles(
+                specSource, self.getDisplayedFs(), self.nperseg, self.noverlap, maxHold=self.specMaxHold)
+
+        self.plotSpecgram()
+        self.updateSpecgramTiles() # In case the view was already zoomed in
+        print("Completed plotSpecgram()")
+
+    @Slot(int, object, object, float, float)
+    def onSpecgramRefined(self, c0, cols, hist, sxxMax, sxxMin):
+        if self.sender() is not self.processingWorker:
+            return # Queued from a cancelled worker
+        self.sxx[:, c0:c0+cols.shape[1]] = cols
+        self.sxxMax = sxxMax
+        self.sxxMin = sxxMin
+        self.specHist = hist
+        self.specVisibleKey = None
+        self.updateVisibleHistogram(*self.getVisibleSegments())
+
+        # Only the new columns need quantizing, unless the range of power has changed
+        if self.specCodes is not None and self.getSpecgramDbRange() == self.specCodesRange:
+            self.specCodes[:, c0:c0+cols.shape[1]] = self.quantizeSpecgram(cols)
+        self.refreshSpecgramImage()
+
+    @Slot()
+    def onSpecgramZoom(self):
+        # Follows the spectrogram's own range, so this works before the time plot is linked to it
+        self.updateSpecgramTiles()
+
+    def getVisibleSegments(self):
+        '''First and one past the last segment in the spectrogram's view.'''
+        xstart, xend = self.spw.viewRange()[0]
+        dfs = self.getDisplayedFs()
+        hop = int(self.nperseg - self.noverlap)
+        return int(xstart * dfs / hop), int(np.ceil(xend * dfs / hop)) + 1
+
+    def updateVisibleHistogram(self, seg0: int, seg1: int):
+        '''Sums the histograms of what is in view, returning whether they changed.'''
+        if self.specView is not None:
+            key = self.specView
+            hist = self.specTileHist
+        elif self.specHist is not None:
+            g0 = min(max(seg0 // self.specStride, 0) // HIST_GROUP_COLUMNS, self.specHist.shape[0] - 1)
+            g1 = max(-(-(seg1 // self.specStride + 1) // HIST_GROUP_COLUMNS), g0 + 1)
+            key = (None, g0, g1)
+            hist = self.specHist[g0:g1]
+        else:
+            return False
+        if key == self.specVisibleKey:
+            return False
+        self.specVisibleHist = hist.sum(axis=0) if hist.ndim > 1 else hist
+        self.specVisibleKey = key
+        return True
+
+    def updateSpecgramTiles(self):
+        '''
+        Shows the tiles of the level that matches the view (once they are computed in the background),
+        or the overview if that is already fine enough, with the contrast fitted to the part in view.
+        '''
+        if self.sxx is None or self.specFreqRes is None:
+            return
+        seg0, seg1 = self.getVisibleSegments()
+        view = None
+        if self.specTiles is not None:
+            level = 0
+            while (seg1 - seg0) >> level > self.SPEC_TARGET_COLUMNS:
+                level += 1
+            if (1 << level) < self.specStride:
+                view = (level,) + self.specTiles.tileRange(level, seg0, seg1)
+
+        if view is not None and view != self.specView:
+            if view != self.specPendingView:
+                self.specPendingView = view
+                self.resliceWorker.submit('tiles', (self.specTiles, view))
+        else:
+            self.specPendingView = None
+            if view is None and self.specView is not None:
+                # The overview is already here, so switch back straight away
+                self.specView = None
+                self.specImage = None
+                self.updateVisibleHistogram(seg0, seg1)
+                self.refreshSpecgramImage(self.getSpecgramRect())
+                return
+
+        # Same image for now, but the contrast follows what is in view
+        if self.updateVisibleHistogram(seg0, seg1):
+            self.sp.setLookupTable(self.getSpecgramLut())
+
+    @Slot(object, object, int, object, object)
+    def onTilesReady(self, specTiles, view, firstSeg, image, hist):
+        # Tiles of a view that has since moved on are still shown if they are of the level wanted,
+        # so that continuous panning doesn't starve the image
+        if specTiles is not self.specTiles or self.specPendingView is None or view[0] != self.specPendingView[0]:
+            return
+        if view == self.specPendingView:
+            self.specPendingView = None
+
+        dfs = self.getDisplayedFs()
+        hop = self.specTiles.hop
+        # Columns are centred on their segments, like the overview
+        rect = QRectF(
+            (firstSeg * hop + self.nperseg/2 - hop/2) / dfs,
+            self.freqs[0]-self.specFreqRes/2,
+            image.shape[1] * (hop << view[0]) / dfs,
+            self.freqs[-1] - self.freqs[0] + self.specFreqRes)
+        self.specView = view
+        self.specImage = image
+        self.specTileHist = hist
+        self.updateVisibleHistogram(*self.getVisibleSegments())
+        self.refreshSpecgramImage(rect)
+        self.prefetchTiles()
+
+    def prefetchTiles(self):
+        '''Computes the tiles on either side of those in view, the side being panned towards first.'''
+        level, k0, k1 = self.specView
+        numTiles = -(-self.specTiles.numSegs // self.specTiles.segsPerTile(level))
+        ks = [k1, k0 - 1] if self.viewMotion[0] >= 0 else [k0 - 1, k1]
+        self.resliceWorker.prefetchAhead(
+            'tiles', [(self.specTiles, level, k) for k in ks if 0 <= k < numTiles])
+
     @Slot()
     def changeToAmpPlot(self):
         # Set the plot type
@@ -349,13 +867,10 @@ class SignalView(QFrame):
             self.idx0 = 0
             self.idx1 = length
 
+            self.resliceApplied = self.resliceId # Anything still being computed is for old plots
             t1 = time.time()
-            t = self.timevec[self.idx0:self.idx1:self.skip]
-            t2 = time.time()
-            amp = np.abs(self.ydata[self.idx0:self.idx1:self.skip])
+            t, (amp,) = self.getCurves(reim=False)
             t3 = time.time()
-            print(t)
-            print(amp)
             
             self.p = self.p1.plot(t, amp)
             self.p.setClipToView(True)
@@ -364,7 +879,7 @@ class SignalView(QFrame):
             t5 = time.time()
             self.p1.disableAutoRange(axis=pg.ViewBox.YAxis)
             t6 = time.time()
-            print("Took %f, %f to slice time and data" % (t2-t1, t3-t2))
+            print("Took %f to slice the data" % (t3-t1))
             print("Took %f, %f, %f to set data, set y range and disable autorange" % (
                 t4-t3, t5-t4, t6-t5))
 
@@ -379,20 +894,19 @@ class SignalView(QFrame):
 
             # Create the tracking marker
             self.pmarker = self.p1.plot([0],[0],pen=None,symbol='o',symbolBrush='y')
+            self.updateViewboxLabel()
             
 
     def plotReim(self):
+        if self.timevec is None:
+            return # Still processing
         # Legend for reim
         self.p1.addLegend()
         # Recreate the plots like ampTime        
-        self.pre = self.p1.plot(
-            self.timevec[self.idx0:self.idx1:self.skip], 
-            np.real(self.ydata[self.idx0:self.idx1:self.skip]),
-            pen='r', name='Re')
-        self.pim = self.p1.plot(
-            self.timevec[self.idx0:self.idx1:self.skip], 
-            np.imag(self.ydata[self.idx0:self.idx1:self.skip]), 
-            pen='c', name='Im')
+        self.resliceApplied = self.resliceId # Anything still being computed is for old plots
+        t, (re, im) = self.getCurves(reim=True)
+        self.pre = self.p1.plot(t, re, pen='r', name='Re')
+        self.pim = self.p1.plot(t, im, pen='c', name='Im')
         self.pre.setClipToView(True)
         self.pim.setClipToView(True)
         
@@ -407,22 +921,16 @@ class SignalView(QFrame):
 
         
 
-    def plotSpecgram(self, window=('tukey',0.25), auto_transpose=False):
+    def getCurves(self, reim: bool):
+        '''Curves of the time plot over the current slice, see ResliceWorker.curves().'''
+        return ResliceWorker.curves(
+            self.ydata, self.pyramid, self.timevec, self.idx0, self.idx1, self.skip, reim, self.overview)
+
+    def plotSpecgram(self, auto_transpose=False):
         # Always extract displayed sample rate first
         dfs = self.getDisplayedFs()
 
-        # Handle the case where not enough to even plot 1 segment
-        if self.ydata.size < self.nperseg:
-            self.freqs, self.ts, self.sxx = sps.spectrogram(
-                np.pad(self.ydata,(0,self.nperseg-self.ydata.size)), dfs, window, self.nperseg, self.noverlap, self.nperseg, 
-                return_onesided=False, detrend=False
-            )
-        else:
-            self.freqs, self.ts, self.sxx = sps.spectrogram(
-                self.ydata, dfs, window, self.nperseg, self.noverlap, self.nperseg, 
-                return_onesided=False, detrend=False
-            )
-
+        # The spectrogram itself is computed by the SignalProcessingWorker
         print(self.sxx.shape) # This is (nfft, self.ts.size)
 
         # Calculate resolutions for later
@@ -432,14 +940,9 @@ class SignalView(QFrame):
         # self.specTimeRes = self.ts[1] - self.ts[0]
         # print(self.specTimeRes) # This is the same as below, so use the below form to not rely on the array generated
         # print((self.nperseg-self.noverlap)/dfs)
-        self.specTimeRes = (self.nperseg-self.noverlap)/dfs
+        self.specTimeRes = self.specStride * (self.nperseg-self.noverlap)/dfs
 
-        self.freqs = np.fft.fftshift(self.freqs) + self.fc # Offset by the centre freq
-        self.sxx = np.fft.fftshift(self.sxx, axes=0)
-        self.sxxMax = np.max(self.sxx.flatten())
-        self.sxxMin = np.min(self.sxx.flatten()) # use this in log-view
-        # Obtain the spans and gaps for proper plotting
-        tspan = self.ts[-1] - self.ts[0]
+        # Obtain the frequency span for the limits
         fspan = self.freqs[-1] - self.freqs[0]
 
         print("Generated specgram base matrix")
@@ -448,21 +951,11 @@ class SignalView(QFrame):
             self.sxx = self.sxx.T
 
         if self.xdata is None:
-            self.sp.setImage(
-                self.sxx, 
-                autoLevels=False, 
-                levels=[0, self.sxxMax],
-                rect=QRectF(
-                    self.ts[0]-self.specTimeRes/2, 
-                    self.freqs[0]-self.specFreqRes/2, 
-                    tspan+self.specTimeRes, 
-                    fspan+self.specFreqRes)
-            ) # set image on existing item instead?
+            self.specCodes = None
+            self.refreshSpecgramImage(self.getSpecgramRect())
             print("Generated specgram image")
 
             self.sp.setAutoDownsample(active=False) # Performance on the downsampler is extremely bad! Main cause of lag spikes
-            cm2use = pg.colormap.get('viridis') # you don't need matplotlib to use viridis!
-            self.sp.setLookupTable(cm2use.getLookupTable())
             
             self.spw.addItem(self.sp) # Must add it back because clears are done in setYData
             print("Added specgram item to plot window")
@@ -549,129 +1042,171 @@ class SignalView(QFrame):
         # Change the other region to match
         self.linearRegion.setRegion(region)
 
-    @Slot()
-    def onZoom(self):
-        tt0 = time.time()
+    def getSliceFor(self, idx0: int, idx1: int, skip: int):
+        """
+        Checks whether a slice still suits the view of the time plot.
 
-        # ==== New implementation
-        # Get the current axes view limits
+        Returns
+        -------
+        target : tuple
+            (idx0, idx1, skip) of a new slice for the view, or None if the given one is fine.
+        """
         xstart, xend = self.p1.viewRange()[0]
         # Define the number of points we want to render for any given snapshot
         lower, target, upper = (5000, 10000, 20000) # This is the lower bound, target, and upper bounds
-
-        # Conditions for re-calculating the plot slice
-        reslice = False
-        ### Check zooms        
         dfs = self.getDisplayedFs()
-        numPtsInRange = (xend-xstart) * dfs // self.skip # Find number of points currently plotted and in viewbox
-        # print("numPtsInRange = %d" % (numPtsInRange))
-        # Check only if we can zoom further in
-        reslice = True if self.skip > 1 and (numPtsInRange < lower or numPtsInRange > upper) else reslice
-        if reslice:
-            print("Reslice is %s after checking zoom" % (reslice))
-        ### Check panning shifts
-        target_i0 = max(int(xstart * dfs), 0) # This is what is requested
-        target_i1 = min(int(xend * dfs), self.ydata.size)
-        reslice = True if target_i0 < self.idx0 or target_i1 > self.idx1 else reslice
-        if reslice:
-            print("Reslice is %s after checking pan" % (reslice))
-
-        # TODO: For specgram downsampling, not used for now
-        # target_i0_spec = max(int((xstart-self.ts[0]) / self.specTimeRes), 0)
-        # target_i1_spec = min(int((xend-self.ts[0]) / self.specTimeRes), self.ts.size)
-
-        # Reslice if needed
-        if reslice:
-            print("Old %d:%d" % (self.idx0, self.idx1))
-            # Add some buffer so we don't trigger too often
-            self.idx0 = max(target_i0 - target, 0)
-            self.idx1 = min(target_i1 + target, self.ydata.size)
-            self.skip = max((target_i1 - target_i0) // target, 1) # We don't include the buffer in the skip calculation
-            print("Plotting %d:%d:%d" % (self.idx0, self.idx1, self.skip))
-
-            
-            t1 = time.time()
-            t = self.timevec[self.idx0:self.idx1:self.skip]
-            t2 = time.time()
-            if self.plotType == self.AMPL_PLOT:
-                amp = np.abs(self.ydata[self.idx0:self.idx1:self.skip])
-                t3 = time.time()
-                
-                self.p.setData(t, amp,
-                            clipToView=True)
-                t4 = time.time()
-                self.p1.vb.setYRange(0, np.max(amp))
-                t5 = time.time()
-            elif self.plotType == self.REIM_PLOT:
-                re = np.real(self.ydata[self.idx0:self.idx1:self.skip])
-                im = np.imag(self.ydata[self.idx0:self.idx1:self.skip])
-                t3 = time.time()
-
-                self.pre.setData(
-                    t, re,
-                    clipToView=True
-                )
-                self.pim.setData(
-                    t, im,
-                    clipToView=True
-                )
-                t4 = time.time()
-                self.p1.vb.setYRange(min(np.min(re),np.min(im)), max(np.max(re), np.max(im)))
-                t5 = time.time()
-
-
-            self.p1.disableAutoRange(axis=pg.ViewBox.YAxis)
-            t6 = time.time()
-            print("Took %f, %f to slice time and data" % (t2-t1, t3-t2))
-            print("Took %f, %f, %f to set data, set y range and disable autorange" % (
-                t4-t3, t5-t4, t6-t5))
-            
-            # # TODO: Similar work for specgram # This is very slow..
-            # self.idx0_spec = max(target_i0_spec - target_i0, 0)
-            # self.idx1_spec = min(target_i1_spec + target_i1, self.ts.size)
-            # self.skip_spec = max((target_i1_spec - target_i0_spec) // target, 1)
-            # print("Plotting %d:%d:%d" % (self.idx0_spec, self.idx1_spec, self.skip_spec))
-
-            # t = self.ts[self.idx0_spec:self.idx1_spec:self.skip_spec]
-            # sxx = self.sxx[:, self.idx0_spec:self.idx1_spec:self.skip_spec]
-
-
-            # tspan = self.ts[-1] - self.ts[0]
-            # fspan = self.freqs[-1] - self.freqs[0]
-            # self.sp.setImage(
-            #     sxx, 
-            #     autoLevels=False, 
-            #     levels=[0, self.sxxMax],
-            #     rect=QRectF(
-            #         self.ts[0]-self.specTimeRes/2,
-            #         self.freqs[0]-self.specFreqRes/2, 
-            #         tspan+self.specTimeRes, 
-            #         fspan+self.specFreqRes)
-            # )
-            
+        numPtsInRange = (xend-xstart) * dfs // skip # Find number of points currently plotted and in viewbox
+        target_i0 = max(int(self.timevec.indexAt(xstart)), 0) # This is what is requested
+        target_i1 = min(int(self.timevec.indexAt(xend)), self.ydata.size)
 
+        # Check zooms (only if we can zoom further in), then panning shifts
+        if (skip > 1 and (numPtsInRange < lower or numPtsInRange > upper)) or target_i0 < idx0 or target_i1 > idx1:
+            # Add some buffer so we don't trigger too often
+            return (
+                max(target_i0 - target, 0),
+                min(target_i1 + target, self.ydata.size),
+                max((target_i1 - target_i0) // target, 1) # We don't include the buffer in the skip calculation
+            )
+        return None
+
+    def trackViewMotion(self):
+        '''Keeps how the time plot's view last moved, to guess where it is going next.'''
+        x0, x1 = self.p1.viewRange()[0]
+        if self.lastXRange is not None:
+            l0, l1 = self.lastXRange
+            ratio = (x1 - x0) / (l1 - l0)
+            if abs(ratio - 1) > 1e-3:
+                # Zoomed; the point that stayed put is where the zoom is about
+                self.viewMotion = (0.0, ratio, (x0 - ratio * l0) / (1 - ratio))
+            elif x0 != l0:
+                self.viewMotion = (x0 - l0, 1.0, None)
+        self.lastXRange = (x0, x1)
+
+    def findCachedSlice(self, reim: bool):
+        '''A cached slice that suits the view, or None.'''
+        for key in reversed(self.sliceCache):
+            if key[3] == reim and self.getSliceFor(*key[:3]) is None:
+                self.sliceCache.move_to_end(key)
+                return key
+        return None
+
+    def cacheSlice(self, key: tuple, curves: tuple):
+        self.sliceCache[key] = curves
+        self.sliceCache.move_to_end(key)
+        while len(self.sliceCache) > self.SLICE_CACHE_SIZE:
+            self.sliceCache.popitem(last=False)
 
+    @Slot()
+    def onZoom(self):
+        if self.timevec is None:
+            return # Still processing
+        self.trackViewMotion()
+
+        # Only decided here; the slice is computed in the background, and only the latest request counts
+        target = self.getSliceFor(self.idx0, self.idx1, self.skip)
+        if target is None:
+            return
+        reim = self.plotType == self.REIM_PLOT
+        key = self.findCachedSlice(reim)
+        self.resliceId += 1
+        if key is not None:
+            # Already computed ahead, so nothing waits on the disk or the worker
+            self.resliceApplied = self.resliceId
+            self.showSlice(*key[:3], *self.sliceCache[key])
+        else:
+            self.resliceWorker.submit('curves', (
+                self.resliceId, self.ydata, self.pyramid, self.timevec) + target + (reim, self.getSmaSources(), self.overview))
+
+    @Slot(int, int, int, int, object, object, object, float, float)
+    def onCurvesReady(self, resliceId, idx0, idx1, skip, t, ys, smaCurves, ymin, ymax):
+        # A slice that has been overtaken is still shown if it suits the view, so that continuous
+        # zooming or panning doesn't starve the plot
+        if resliceId <= self.resliceApplied:
+            return
+        reim = len(ys) == 2
+        self.cacheSlice((idx0, idx1, skip, reim), (t, ys, smaCurves, ymin, ymax))
+        if resliceId != self.resliceId and self.getSliceFor(idx0, idx1, skip) is not None:
+            return
+        if reim != (self.plotType == self.REIM_PLOT):
+            return # For the other plot type
+        self.resliceApplied = resliceId
+        self.showSlice(idx0, idx1, skip, t, ys, smaCurves, ymin, ymax)
+
+    @Slot(object, object)
+    def onSlicePrefetched(self, request, curves):
+        generation, _, _, _, idx0, idx1, skip, reim, _, _ = request
+        if generation == self.sliceGeneration:
+            self.cacheSlice((idx0, idx1, skip, reim), curves)
+
+    def showSlice(self, idx0, idx1, skip, t, ys, smaCurves, ymin, ymax):
+        self.idx0, self.idx1, self.skip = idx0, idx1, skip
+
+        if self.plotType == self.AMPL_PLOT:
+            self.p.setData(t, ys[0], clipToView=True)
+        elif self.plotType == self.REIM_PLOT:
+            self.pre.setData(t, ys[0], clipToView=True)
+            self.pim.setData(t, ys[1], clipToView=True)
+        for length, curve in smaCurves.items():
+            if length in self.smaplots:
+                self.smaplots[length].setData(*curve)
+        if np.isfinite(ymin) and np.isfinite(ymax):
+            self.p1.vb.setYRange(ymin, ymax)
+        self.p1.disableAutoRange(axis=pg.ViewBox.YAxis)
 
         # Update UI
-        self.viewboxlabel.setText("Plot indices: %5d : %5d : %5d (Max)" % (
-            self.idx0, self.idx1, self.skip))
-        
-        tt1 = time.time()
-        print("%fs for update." % (tt1-tt0))
+        self.updateViewboxLabel()
+        self.prefetchSlices()
+
+    def updateViewboxLabel(self):
+        self.viewboxlabel.setText("Plot indices: %5d : %5d : %5d (Max)%s" % (
+            self.idx0, self.idx1, self.skip,
+            # The spectrogram is of the unprocessed samples, and so is the envelope until zoomed in to the samples
+            "" if self.overview is None else
+            " - unprocessed envelope and spectrogram" if self.skip > 1 else " - unprocessed spectrogram"))
 
+    def prefetchSlices(self):
+        """
+        Computes, in the background, the slices that the view is likely to need next:
+        panning on past either end of the current slice, and zooming one level in or out.
+        They are ordered by how the view has been moving.
+        """
+        n = self.ydata.size
+        width = self.skip * self.target # Samples in the view that the slice was made for
+        buffer = self.target
+        right = (max(self.idx1 - width - buffer, 0), min(self.idx1 + width + buffer, n), self.skip)
+        left = (max(self.idx0 - width - buffer, 0), min(self.idx0 + width + buffer, n), self.skip)
+        # Zooming in only needs finer points over the same samples; zooming out keeps the zoom's centre in place
+        zoomIn = (self.idx0, self.idx1, self.skip // 2)
+        pan, ratio, centre = self.viewMotion
+        c = min(max(centre * self.getDisplayedFs(), self.idx0), self.idx1) if centre is not None else (self.idx0 + self.idx1) / 2
+        zoomOut = (max(int(c - 2 * (c - self.idx0)), 0), min(int(c + 2 * (self.idx1 - c)), n), self.skip * 2)
+
+        pans = [left, right] if pan < 0 else [right, left]
+        zooms = [zoomOut, zoomIn] if ratio > 1 else [zoomIn, zoomOut]
+        candidates = zooms + pans if ratio != 1 else pans + zooms
+
+        reim = self.plotType == self.REIM_PLOT
+        smas = self.getSmaSources()
+        items = []
+        for idx0, idx1, skip in candidates:
+            if (skip < 1 or idx1 <= idx0 or (idx0, idx1, skip) == (self.idx0, self.idx1, self.skip)
+                    or (skip > 1 and (idx1 - idx0) // skip < self.lower) or (idx0, idx1, skip, reim) in self.sliceCache):
+                continue
+            items.append((self.sliceGeneration, self.ydata, self.pyramid, self.timevec, idx0, idx1, skip, reim, smas, self.overview))
+        self.resliceWorker.prefetchAhead('curves', items)
 
     def ampMouseMoved(self, evt):
         modifiers = QApplication.keyboardModifiers()
         # Only map markers when shift is held down, otherwise this can slow down zooming for large data sets
         # TODO: maybe only mark based on plotted values?
-        if modifiers == Qt.ShiftModifier:
+        if modifiers == Qt.ShiftModifier and self.timevec is not None:
             mousePoint = self.p1.vb.mapSceneToView(evt[0])
             self.xCoordLabel.setText("X: %f" % (mousePoint.x()))
             self.ampCoordLabel.setText("Y (Top): %f" % (mousePoint.y()))
 
             # Find nearest point based on x value
             # For now, we ignore the viewing downsample rate (only read the pure data)
-            timeIdx = int(np.round((mousePoint.x() - self.timevec[0]) * self.getDisplayedFs()))
+            timeIdx = int(np.round(self.timevec.indexAt(mousePoint.x())))
             
             # Set the marker
             if timeIdx > 0 and timeIdx < self.ydata.size:
@@ -726,7 +1261,7 @@ class SignalView(QFrame):
                 self.deleteLinearRegions()
 
 
-        elif modifiers == Qt.ControlModifier and Qt.MouseButton.LeftButton == evt[0].button():
+        elif modifiers == Qt.ControlModifier and Qt.MouseButton.LeftButton == evt[0].button() and self.timevec is not None:
             # Add Marker
             mousePoint = self.p1.vb.mapToView(evt[0].pos()) # use mapToView instead of mapSceneToView here, not sure why..
             # Start a dialog for the label
@@ -740,7 +1275,7 @@ class SignalView(QFrame):
                 print(self.sampleStarts)
                 print(self.filelist)
 
-                scaled_x = mousePoint.x() * self.fs # Scale to the sample fs, (not displayed fs)
+                scaled_x = self.timeToSample(mousePoint.x()) # Scale to the sample fs, (not displayed fs)
                 dbfilepath, dbsamplestart = self.getFileSamplePair(scaled_x)
 
                 # Check if this marker has been saved before
@@ -806,14 +1341,10 @@ class SignalView(QFrame):
         self.freqRegion = None
 
     def getFileSamplePair(self, x):
-        for i in range(len(self.sampleStarts)):
-            dbsamplestart = self.sampleStarts[i] - x
-            if dbsamplestart > 0:
-                dbfilepath = self.filelist[i-1] # this is offset by 1
-                dbsamplestart = x - self.sampleStarts[i-1] # revert to positive value
-                break
-        
-        return dbfilepath, dbsamplestart
+        # x is in samples at the original fs, which is what sampleStarts counts
+        fileIdx, dbsamplestart = locateSample(self.sampleStarts, x)
+
+        return self.filelist[fileIdx], dbsamplestart
 
     def addMarkerLines(self, xvalues, labels):
         for i in range(len(xvalues)):
@@ -834,7 +1365,7 @@ class SignalView(QFrame):
             
             if r == QMessageBox.StandardButton.Yes:
                 # Get the file for this marker
-                dbfilepath, dbsamplestart = self.getFileSamplePair(event.p[0] * self.fs) # Scale to sample rate (not displayed fs)
+                dbfilepath, dbsamplestart = self.getFileSamplePair(self.timeToSample(event.p[0])) # Scale to sample rate (not displayed fs)
                 # Remove from db
                 self.markerdb.delMarkers([dbfilepath], [dbsamplestart])
                 # Remove from the plot
@@ -845,15 +1376,15 @@ class SignalView(QFrame):
     def contextMenuEvent(self, event):
         dfs = self.getDisplayedFs()
 
-        # Extract the slice if it's present
+        # Extract the slice indices if it's present
         if self.linearRegion is not None:
             region = self.linearRegion.getRegion()
             startIdx, endIdx = self.convertRegionToIndices(region)
-            selection = self.ydata[startIdx:endIdx]
         else:
             startIdx = 0
             endIdx = len(self.ydata)
-            selection = self.ydata # Shouldn't invoke a copy so we should be fine
+        # Only sliced once an action needs it; this reads the samples for lazily loaded data
+        getSelection = lambda: self.ydata[startIdx:endIdx]
 
         modifiers = QApplication.keyboardModifiers()
         if bool(modifiers == Qt.ControlModifier): # Going to leave it as control-modifier, in case we want the pyqtgraph default menu back later on
@@ -883,7 +1414,7 @@ class SignalView(QFrame):
             # Start the menu
             action = menu.exec_(self.mapToGlobal(event.pos()))
             if action == fftAction:
-                self.fftwin = FFTWindow(selection, startIdx, endIdx, dfs)
+                self.fftwin = FFTWindow(getSelection(), startIdx, endIdx, dfs)
                 self.fftwin.show()
 
             elif action == addSliceAction:
@@ -899,11 +1430,11 @@ class SignalView(QFrame):
                     self.deleteLinearRegions()
 
             elif action == estBaudAction:
-                self.baudwin = EstimateBaudWindow(selection, startIdx, endIdx, dfs)
+                self.baudwin = EstimateBaudWindow(getSelection(), startIdx, endIdx, dfs)
                 self.baudwin.show()
 
             elif action == estFreqAction:
-                self.freqwin = EstimateFreqWindow(selection, startIdx, endIdx, dfs)
+                self.freqwin = EstimateFreqWindow(getSelection(), startIdx, endIdx, dfs)
                 self.freqwin.show()
 
             elif action == energyDetectAction:
@@ -911,11 +1442,11 @@ class SignalView(QFrame):
                 self.threshwin.show()
 
             elif action == audioAction:
-                self.audiowin = AudioWindow(selection, startIdx, endIdx, dfs)
+                self.audiowin = AudioWindow(getSelection(), startIdx, endIdx, dfs)
                 self.audiowin.show()
 
             elif action == demodAction:
-                self.demodwin = DemodWindow(selection, startIdx, endIdx, dfs)
+                self.demodwin = DemodWindow(getSelection(), startIdx, endIdx, dfs)
                 self.demodwin.show()
 
             elif action == phasorAction:
@@ -929,7 +1460,7 @@ class SignalView(QFrame):
                 self.DataSelectionSignal.emit(
                     self.filelist,
                     [startIdx, endIdx],
-                    selection
+                    getSelection()
                 )
                 # Show the dialog; user can copy/paste code and it should be ready by the time
                 # the dialog shows up
@@ -946,14 +1477,9 @@ class SignalView(QFrame):
 
 
     def convertRegionToIndices(self, region):
-        dfs = self.getDisplayedFs()
-
-        # First make sure it's clipped to the start/end of the data only
-        rstart = region[0] if region[0] >=0 else 0
-        rend = region[1] if region[1] < self.ydata.size/dfs else (self.ydata.size-1)/dfs
-
-        startIdx = int(rstart*dfs)
-        endIdx = int(rend*dfs)
+        # Clipped to the start/end of the data only
+        startIdx = max(int(self.timevec.indexAt(region[0])), 0)
+        endIdx = min(int(self.timevec.indexAt(region[1])), self.ydata.size - 1)
 
         return startIdx, endIdx
 
@@ -997,3 +1523,365 @@ class SignalView(QFrame):
         self.exporter.parameters()['width'] = targetWidth # This is actually a global resolution parameter
         self.exporter.export()
 
+
+
+# =================================
+class ResliceWorker(QThread):
+    """
+    Computes what the view needs after it moves (the time plot's curves and the spectrogram tiles)
+    off the GUI thread. Requests are coalesced: only the latest waiting one of each kind is computed,
+    and the view drops the results that are no longer current. When idle, it works through what
+    the view is expected to need next.
+    """
+    curvesReady = Signal(int, int, int, int, object, object, object, float, float)
+    tilesReady = Signal(object, object, int, object, object)
+    slicePrefetched = Signal(object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.mutex = QMutex()
+        self.wakeup = QWaitCondition()
+        self.pending = {} # Kind ('curves' or 'tiles') -> latest request
+        self.prefetch = {'curves': [], 'tiles': []} # Kind -> items to compute ahead, most likely first
+
+    def submit(self, kind: str, request: tuple):
+        '''Queues a request, replacing any of the same kind that hasn't started yet.'''
+        with QMutexLocker(self.mutex):
+            self.pending[kind] = request
+            self.wakeup.wakeOne()
+
+    def prefetchAhead(self, kind: str, items: list):
+        '''Replaces what is computed ahead of a kind, once there are no requests waiting.'''
+        with QMutexLocker(self.mutex):
+            self.prefetch[kind] = list(items)
+            self.wakeup.wakeOne()
+
+    def stop(self):
+        self.requestInterruption()
+        with QMutexLocker(self.mutex):
+            self.wakeup.wakeOne()
+        self.wait()
+
+    def run(self):
+        while True:
+            with QMutexLocker(self.mutex):
+                while (len(self.pending) == 0 and not any(self.prefetch.values())
+                       and not self.isInterruptionRequested()):
+                    self.wakeup.wait(self.mutex)
+                if self.isInterruptionRequested():
+                    return
+                prefetching = len(self.pending) == 0
+                if prefetching:
+                    kind = 'curves' if self.prefetch['curves'] else 'tiles'
+                    request = self.prefetch[kind].pop(0)
+                else:
+                    kind, request = self.pending.popitem()
+
+            if kind == 'curves':
+                _, ydata, pyramid, timevec, idx0, idx1, skip, reim, smas, overview = request
+                result = self.sliceCurves(ydata, pyramid, timevec, idx0, idx1, skip, reim, smas, overview)
+                if prefetching:
+                    self.slicePrefetched.emit(request, result)
+                else:
+                    self.curvesReady.emit(request[0], idx0, idx1, skip, *result)
+            elif prefetching:
+                specTiles, level, k = request
+                specTiles.getTile(level, k) # Only to have it in the tile cache
+            else:
+                specTiles, view = request
+                firstSeg, image, hist = specTiles.getTiles(*view)
+                self.tilesReady.emit(specTiles, view, firstSeg, image, hist)
+
+    @classmethod
+    def sliceCurves(
+        cls, ydata, pyramid, timevec, idx0: int, idx1: int, skip: int, reim: bool, smas: tuple = (), overview=None
+    ):
+        """
+        The curves of a slice (see curves()), those of the SMAs over it, and the y-range that fits them.
+
+        Returns
+        -------
+        t : np.ndarray
+            Times of the points.
+        ys : list
+            The amplitude, or the real and imaginary parts.
+        smaCurves : dict
+            Length -> (t, y) of each of smas, given as (length, SMA, its pyramid).
+        ymin, ymax : float
+            Range of ys; nan if the slice is empty.
+        """
+        t, ys = cls.curves(ydata, pyramid, timevec, idx0, idx1, skip, reim, overview)
+        smaCurves = {}
+        for length, sma, smaPyramid in smas:
+            smaT, (smaY,) = cls.curves(sma, smaPyramid, timevec, idx0, idx1, skip, False)
+            smaCurves[length] = (smaT, smaY)
+        if ys[0].size > 0:
+            ymin = 0.0 if not reim else float(min(np.min(y) for y in ys))
+            ymax = float(max(np.max(y) for y in ys))
+        else:
+            ymin = ymax = np.nan
+        return t, ys, smaCurves, ymin, ymax
+
+    @staticmethod
+    def curves(ydata, pyramid, timevec, idx0: int, idx1: int, skip: int, reim: bool, overview=None):
+        """
+        Curves of the time plot over ydata[idx0:idx1]: the samples themselves if skip is 1,
+        otherwise the pyramid's envelope at the level that matches skip. Each block of the
+        envelope is drawn as its min followed by its max, so it becomes a vertical stroke.
+        If the pyramid is of other samples on the same grid (overview, e.g. the unprocessed ones
+        when processing lazily), the whole envelope is of those, including the blocks not in it.
+
+        Returns
+        -------
+        t : np.ndarray
+            Times of the points.
+        ys : list
+            The amplitude, or the real and imaginary parts.
+        """
+        if skip == 1:
+            y = ydata[idx0:idx1]
+            return timevec[idx0:idx0 + y.size], [np.real(y), np.imag(y)] if reim else [np.abs(y)]
+
+        # Two points are drawn per block, so the blocks are twice as long as skip
+        starts, rows = pyramid.getEnvelope(ydata if overview is None else overview, idx0, idx1, 2 * skip)
+        t = np.repeat(timevec.times(starts), 2)
+        if reim:
+            return t, [rows[:, [REMIN, REMAX]].reshape(-1), rows[:, [IMMIN, IMMAX]].reshape(-1)]
+        return t, [rows[:, [AMIN, AMAX]].reshape(-1)]
+
+class ProcessingCancelled(Exception):
+    '''Raised inside the SignalProcessingWorker (or MovingAverageWorker) when it has been interrupted.'''
+    pass
+
+# =================================
+class SignalProcessingWorker(QThread):
+    stageProgress = Signal(str, int)
+    ampReady = Signal(object, object, object)
+    specgramReady = Signal(object, object, object, object, object, object, float, float, int)
+    specgramRefined = Signal(int, object, object, float, float)
+
+    # Shown with the progress of each stage of the chain
+    STAGE_LABELS = {
+        'ddc': "Pre-processing", 'grid': "Pre-processing", 'pyramid': "Overview", 'spectrogram': "Spectrogram"}
+
+    def __init__(
+        self, ydata, fs: float, fc: float, freqshift, numTaps, filtercutoff, dsr,
+        nperseg: int, noverlap, window=('tukey',0.25), maxHold: bool = False,
+        filelist: list = None, filesettings: dict = None, cacheBudget: float = DEFAULT_BUDGET_GB,
+        chain: ProcessingChain = None, lazy: bool = False, parent=None
+    ):
+        super().__init__(parent)
+
+        # Settings are copied so that the view can change them while this runs
+        self.filelist = [] if filelist is None else filelist
+        self.filesettings = filesettings
+        self.cacheBudget = cacheBudget
+
+        # Stages computed with the same parameters before are reused, and new ones are stored in it
+        self.chain = ProcessingChain(ydata) if chain is None else chain
+        self.params = {
+            'fs': fs, 'fc': fc, 'freqshift': freqshift, 'numTaps': numTaps, 'filtercutoff': filtercutoff,
+            'dsr': dsr, 'nperseg': nperseg, 'noverlap': noverlap, 'window': window, 'maxHold': maxHold,
+            'lazy': lazy}
+
+    def run(self):
+        try:
+            t1 = time.time()
+            ydata = self.chain.run('ddc', self.params, self.checkpoint)
+            t2 = time.time()
+            print("Pre-processing: %fs.\n" % (t2-t1))
+
+            # Reuse what was derived the last time these files were opened with these settings
+            missing = self.chain.get('pyramid', self.params) is None or self.chain.get('spectrogram', self.params) is None
+            cache, key = self.openCache() if missing else (None, None)
+            if key is not None:
+                arrays, scalars = cache.load(key)
+                if arrays is not None:
+                    print("Loaded pyramid and spectrogram from sidecar %s" % (key))
+                    self.chain.store('pyramid', self.params, MinMaxPyramid.fromArrays(arrays, scalars['pyramidSize']))
+                    # Rebuilt if the entry was saved without the histograms
+                    hist = arrays.get('specHist')
+                    if hist is None:
+                        hist = powerHistogram(arrays['sxx'])[1]
+                    self.chain.store('spectrogram', self.params, {
+                        'freqs': arrays['freqs'], 'ts': arrays['ts'], 'sxx': arrays['sxx'], 'hist': hist,
+                        'sxxMax': scalars['sxxMax'], 'sxxMin': scalars['sxxMin'], 'stride': scalars['specStride'],
+                        'fs': scalars['specFs'], 'fc': scalars['specFc']})
+                    key = None # Nothing new to save
+
+            # A coarse spectrogram first, so there is something to look at (and pan around) right away,
+            # then the time plot, while the spectrogram is refined
+            self.overviewsShown = False
+            spec = self.chain.run(
+                'spectrogram', self.params, self.checkpoint,
+                onCoarse=lambda coarse: self.showOverviews(ydata, coarse), onRefined=self.specgramRefined.emit)
+            if not self.overviewsShown:
+                # It was cached, so there was nothing coarse to show
+                self.showOverviews(ydata, spec)
+
+            if key is not None:
+                pyramid = self.chain.run('pyramid', self.params)
+                self.stageProgress.emit("Saving cache", 100)
+                cache.save(key, dict(
+                    pyramid.toArrays(), freqs=spec['freqs'], ts=spec['ts'], sxx=spec['sxx'], specHist=spec['hist']), {
+                    'pyramidSize': pyramid.size, 'sxxMax': spec['sxxMax'], 'sxxMin': spec['sxxMin'],
+                    'specStride': spec['stride'], 'specFs': spec['fs'], 'specFc': spec['fc']})
+        except ProcessingCancelled:
+            print("Processing cancelled")
+
+    def showOverviews(self, ydata, spec: dict):
+        '''
+        Emits the (coarse or finished) spectrogram along with the samples it is of, and then the amplitude
+        pyramid (computing it if needed) along with the samples it summarises.
+        '''
+        specSource = self.chain.run(ProcessingChain.inputOf('spectrogram', self.params), self.params)
+        self.specgramReady.emit(
+            ydata, specSource, spec['freqs'], spec['ts'], spec['sxx'], spec['hist'],
+            spec['sxxMax'], spec['sxxMin'], spec['stride'])
+        pyramid = self.chain.run('pyramid', self.params, self.checkpoint)
+        overview = self.chain.run(ProcessingChain.inputOf('pyramid', self.params), self.params)
+        self.ampReady.emit(ydata, pyramid, overview)
+        self.overviewsShown = True
+
+    def openCache(self):
+        '''Opens the sidecar cache (in this thread) and makes the key for this data, if it can be cached.'''
+        if self.filesettings is None or self.cacheBudget <= 0:
+            return None, None
+        # Keyed like the stages, so fs and fc alone don't make a new entry (the spectrogram is relabelled)
+        overviewStage = ProcessingChain.inputOf('pyramid', self.params)
+        key = SidecarCache.makeKey(self.filelist, self.filesettings, {
+            'overview': (overviewStage, ProcessingChain.stageParams(overviewStage, self.params)),
+            'spectrogram': ProcessingChain.stageParams('spectrogram', self.params)})
+        if key is None:
+            return None, None
+        return SidecarCache(budget=self.cacheBudget * 2**30), key
+
+    def checkpoint(self, stage: str, done: int, total: int):
+        '''Progress callback for the chain, which also cancels it when requested.'''
+        self.stageProgress.emit(self.STAGE_LABELS.get(stage, stage), int(100 * done / max(total, 1)))
+        if self.isInterruptionRequested():
+            raise ProcessingCancelled()
+
+# =================================
+class MovingAverageWorker(QThread):
+    """
+    Computes the SMAs of the amplitude for several lengths in one pass (see movingAverages()),
+    and a min/max pyramid for each, so that they are resliced through the same envelopes
+    as the amplitude.
+    """
+    smasReady = Signal(object, object)
+
+    def __init__(self, ydata, lengths: list, parent=None):
+        super().__init__(parent)
+        self.ydata = ydata
+        self.lengths = lengths
+
+    def checkpoint(self, done: int, total: int):
+        if self.isInterruptionRequested():
+            raise ProcessingCancelled()
+
+    def run(self):
+        try:
+            t1 = time.time()
+            smas = movingAverages(self.ydata, self.lengths, callback=self.checkpoint)
+            results = {length: (sma, MinMaxPyramid.build(sma, self.checkpoint)) for length, sma in smas.items()}
+            print("Took %f to compute SMAs of lengths %s" % (time.time()-t1, str(list(smas))))
+        except ProcessingCancelled:
+            return
+        self.smasReady.emit(self.ydata, results)
+
+class TimeVector:
+    '''
+    Stands in for start + np.arange(size) / fs, generating only the times that are asked for,
+    so nothing full-length is ever allocated for the x-axis.
+    '''
+
+    def __init__(self, size: int, fs: float, start: float = 0.0):
+        self.size = size
+        self.fs = fs
+        self.start = start
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.times(np.arange(*key.indices(self.size)))
+        idx = int(key)
+        return self.times(idx + self.size if idx < 0 else idx)
+
+    def times(self, indices):
+        '''Times of sample indices, which may be fractional.'''
+        return self.start + np.asarray(indices) / self.fs
+
+    def indexAt(self, t):
+        '''Sample index (fractional) at a time.'''
+        return (t - self.start) * self.fs
+
+# =================================
+class LiveTailWorker(QThread):
+    samplesAppended = Signal(object, object, int, object)
+
+    POLL_INTERVAL = 100 # Milliseconds between checks of the file size
+    MAX_COLUMNS = 1 << 15 # Spectrogram columns are decimated to stay within this
+    MAX_BLOCKS = 1 << 16 # Pyramid blocks computed per poll (across all cores); the rest are caught up on later polls
+
+    def __init__(
+        self, filepath: str, filesettings: dict, fs: float, nperseg: int, noverlap,
+        window=('tukey',0.25), parent=None
+    ):
+        super().__init__(parent)
+
+        self.filepath = filepath
+        self.filesettings = filesettings
+        self.fs = fs
+        self.nperseg = nperseg
+        self.hop = int(nperseg - noverlap)
+        self.window = window
+
+    def run(self):
+        fmt = self.filesettings['fmt']
+        headersize = self.filesettings['headersize']
+        sampleStart = self.filesettings['sampleStart']
+        total = 0
+        nextSeg = 0 # Next segment to compute a column for
+        stride = 1 # Segments between columns
+        nextBlock = 0 # Next pyramid block to compute a row for
+
+        while not self.isInterruptionRequested():
+            count = countSamples([self.filepath], fmt, headersize, sampleStart)[0]
+            if count <= total and nextBlock >= count // BASE:
+                self.msleep(self.POLL_INTERVAL)
+                continue
+
+            # Remap to cover the new length; only the new part is read below
+            seg = openMemmaps([self.filepath], fmt, headersize, sampleStart, count)[0]
+            data = VirtualSampleArray(
+                [seg], self.filesettings['swapEndian'], self.filesettings['invSpec'])
+
+            # Coarsen the column grid (by powers of 2) if the image would get too long,
+            # this is also what lets it keep up with fast writers
+            numSegs = (count - self.nperseg) // self.hop + 1 if count >= self.nperseg else 0
+            while numSegs > stride * self.MAX_COLUMNS:
+                stride *= 2
+            nextSeg = -(-nextSeg // stride) * stride
+            starts = np.arange(nextSeg, numSegs, stride) * self.hop
+            nextSeg += starts.size * stride
+
+            # Pyramid rows for the newly completed blocks; the view merges them into the upper levels
+            numBlocks = min(count // BASE, nextBlock + self.MAX_BLOCKS)
+            rows = baseRows(data, nextBlock, numBlocks)
+            nextBlock = numBlocks
+
+            total = count
+            self.samplesAppended.emit(data, self.computeColumns(seg, starts), stride, rows)
+
+    def computeColumns(self, seg: np.ndarray, starts: np.ndarray):
+        if starts.size == 0:
+            return np.empty((self.nperseg, 0), dtype=np.float32)
+
+        # Gather just the segments that are needed, then convert and transform them back to back
+        windows = np.lib.stride_tricks.sliding_window_view(seg, 2*self.nperseg)[::2]
+        x = convertToComplex64(
+            windows[starts].reshape(-1),
+            np.empty(starts.size * self.nperseg, dtype=np.complex64),
+            self.filesettings['swapEndian'], self.filesettings['invSpec'], workers=1)
+        win, _ = stftWindow(x, self.fs, self.window, self.nperseg, shift=True)
+        return segmentPowers(x, win, self.nperseg, False, workers=1).T
@@ -0,0 +1,83 @@
+'''
+Level-of-detail spectrogram, computed on demand in tiles.
+
+A column at level L averages (or max-holds) 2**L consecutive segments, and a tile holds TILE_COLUMNS columns
+of one level. Only the tiles that cover the visible range are computed, and they are kept in
+an LRU cache under a memory budget, so panning back over them is free. Each tile also keeps a
+histogram of its power, for setting the contrast from what is in view.
+'''
+
+import numpy as np
+from collections import OrderedDict
+
+from dsp import averagedSpectrogram, powerHistogram
+
+TILE_COLUMNS = 256
+DEFAULT_TILE_BUDGET = 256 * 2**20 # Bytes
+
+
+class SpecgramTiles:
+    def __init__(
+        self, ydata, fs: float, nperseg: int, noverlap, window=('tukey',0.25),
+        maxHold: bool = False, budget: int = DEFAULT_TILE_BUDGET
+    ):
+        self.ydata = ydata
+        self.fs = fs
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.hop = int(nperseg - noverlap)
+        self.window = window
+        self.maxHold = maxHold
+        self.numSegs = (ydata.size - nperseg) // self.hop + 1 if ydata.size >= nperseg else 0
+
+        self.budget = budget
+        self.tiles = OrderedDict() # (level, index) -> (fftshifted float32 columns, power histogram)
+        self.nbytes = 0
+
+    def segsPerTile(self, level: int):
+        return TILE_COLUMNS << level
+
+    def getTile(self, level: int, index: int):
+        key = (level, index)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+
+        seg0 = index * self.segsPerTile(level)
+        _, _, sxx, _, _ = averagedSpectrogram(
+            self.ydata, self.fs, self.window, self.nperseg, self.noverlap, 1 << level,
+            seg0, seg0 + self.segsPerTile(level), maxHold=self.maxHold, shift=True)
+        tile = (sxx, powerHistogram(sxx)[1].sum(axis=0))
+
+        self.tiles[key] = tile
+        self.nbytes += tile[0].nbytes + tile[1].nbytes
+        while self.nbytes > self.budget and len(self.tiles) > 1:
+            _, (oldSxx, oldHist) = self.tiles.popitem(last=False)
+            self.nbytes -= oldSxx.nbytes + oldHist.nbytes
+        return tile
+
+    def tileRange(self, level: int, seg0: int, seg1: int):
+        '''Indices of the first and one past the last tile of a level that cover segments seg0 to seg1.'''
+        seg0 = min(max(seg0, 0), max(self.numSegs - 1, 0))
+        seg1 = min(seg1, self.numSegs)
+        k0 = seg0 // self.segsPerTile(level)
+        k1 = max(-(-seg1 // self.segsPerTile(level)), k0 + 1)
+        return k0, k1
+
+    def getTiles(self, level: int, k0: int, k1: int):
+        """
+        Joins tiles k0 to k1 of a level.
+
+        Returns
+        -------
+        firstSeg : int
+            Segment at which the first column starts.
+        sxx : np.ndarray
+            Columns of the tiles, fftshifted.
+        hist : np.ndarray
+            Histogram of their power, see powerHistogram().
+        """
+        tiles = [self.getTile(level, k) for k in range(k0, k1)]
+        sxx = np.hstack([tileSxx for tileSxx, _ in tiles])
+        hist = np.sum([tileHist for _, tileHist in tiles], axis=0)
+        return k0 * self.segsPerTile(level), sxx, hist
@@ -0,0 +1,180 @@
+import sqlite3 as sq
+import numpy as np
+import scipy.fft
+import os
+
+from sampleLoader import openMemmaps, VirtualSampleArray, READ_CHUNK
+
+'''
+Database with just one table called 'filestats', kept in cache.db next to the file list.
+Each row is keyed by the file's (path, size, mtime) and the format settings used to read it,
+so a file that is rewritten (or read with other settings) simply misses the cache.
+
+Columns after the key are the statistics:
+'numSamples, meanAmp, medianAmp, maxAmp, envelope, spectrum'.
+The envelope is the mean power over ENVELOPE_POINTS equal spans of the file, and the
+spectrum is the (unshifted) average power spectrum of non-overlapping SPECTRUM_NFFT segments.
+Both are stored as float32 blobs.
+The median amplitude comes from a histogram of the amplitudes (see MEDIAN_BIN_SHIFT),
+so it is only accurate to about 0.05%, but nothing of the file's length is kept for it.
+'''
+
+ENVELOPE_POINTS = 512
+SPECTRUM_NFFT = 1024
+# The median histogram bins the float32 bits of the (non-negative) amplitudes without their lowest
+# MEDIAN_BIN_SHIFT bits; the bits order like the values, and each bin is within 2**-11 of its value
+MEDIAN_BIN_SHIFT = 12
+MEDIAN_BINS = 1 << (31 - MEDIAN_BIN_SHIFT)
+
+
+def histogramMedian(counts: np.ndarray):
+    '''Median of the amplitudes counted in a MEDIAN_BIN_SHIFT histogram, as the centres of the middle bins.'''
+    cumulative = np.cumsum(counts)
+    N = int(cumulative[-1])
+    bins = np.searchsorted(cumulative, [(N - 1) // 2, N // 2], 'right')
+    centres = ((bins.astype(np.uint32) << MEDIAN_BIN_SHIFT) | (1 << (MEDIAN_BIN_SHIFT - 1))).view(np.float32)
+    return float(np.mean(centres, dtype=np.float64))
+
+
+def computeFileStats(
+    filepath: str,
+    fmt: type = np.int16,
+    headersize: int = 0,
+    swapEndian: bool = False,
+    invSpec: bool = False
+):
+    """
+    Computes the statistics of a whole file in one chunked pass over a memory-map.
+
+    Returns
+    -------
+    stats : dict
+        With keys numSamples, meanAmp, medianAmp, maxAmp, envelope and spectrum.
+        medianAmp is approximate (see histogramMedian()).
+    """
+    data = VirtualSampleArray(openMemmaps([filepath], fmt, headersize), swapEndian, invSpec)
+    N = data.size
+    numPoints = min(ENVELOPE_POINTS, N)
+    edges = (np.arange(numPoints + 1) * N) // numPoints if N > 0 else np.zeros(1, dtype=np.int64)
+    envelope = np.zeros(numPoints)
+    spectrum = np.zeros(SPECTRUM_NFFT)
+    numSegs = 0
+    window = np.hanning(SPECTRUM_NFFT).astype(np.float32)
+    ampCounts = np.zeros(MEDIAN_BINS, dtype=np.int64)
+    ampSum = 0.0
+    ampMax = 0.0
+
+    for c0 in range(0, N, READ_CHUNK):
+        c1 = min(c0 + READ_CHUNK, N)
+        x = data[c0:c1]
+        a = np.abs(x).astype(np.float32, copy=False)
+        ampSum += np.sum(a, dtype=np.float64)
+        ampMax = max(ampMax, float(np.max(a)))
+        ampCounts += np.bincount(a.view(np.uint32) >> MEDIAN_BIN_SHIFT, minlength=MEDIAN_BINS)
+
+        # Add the power into the envelope spans that this chunk covers
+        b0 = np.searchsorted(edges, c0, 'right') - 1
+        inner = edges[(edges > c0) & (edges < c1)] - c0
+        power = a.astype(np.float64)**2
+        sums = np.add.reduceat(power, np.concatenate(([0], inner)))
+        envelope[b0:b0 + sums.size] += sums
+
+        # Chunks start on multiples of the FFT length, so the segments line up across chunks
+        k = (c1 - c0) // SPECTRUM_NFFT
+        if k > 0:
+            X = scipy.fft.fft(x[:k*SPECTRUM_NFFT].reshape((k, SPECTRUM_NFFT)) * window, axis=1)
+            spectrum += np.sum(X.real**2 + X.imag**2, axis=0)
+            numSegs += k
+
+    return {
+        'numSamples': N,
+        'meanAmp': ampSum / N if N > 0 else 0.0,
+        'medianAmp': histogramMedian(ampCounts) if N > 0 else 0.0,
+        'maxAmp': ampMax,
+        'envelope': (envelope / np.diff(edges)).astype(np.float32),
+        'spectrum': (spectrum / max(numSegs, 1)).astype(np.float32)
+    }
+
+
+class FileStatsDB:
+    def __init__(self, filepath="cache.db"):
+        self.con = sq.connect(filepath)
+        self.cur = self.con.cursor()
+        self.initTable()
+
+    def initTable(self):
+        self.cur.execute(
+            "create table if not exists filestats("
+            "path TEXT, size INTEGER, mtime INTEGER, fmt TEXT, headersize INTEGER, swapEndian INTEGER, invSpec INTEGER, "
+            "numSamples INTEGER, meanAmp REAL, medianAmp REAL, maxAmp REAL, envelope BLOB, spectrum BLOB, "
+            "PRIMARY KEY(path, size, mtime, fmt, headersize, swapEndian, invSpec))")
+        self.con.commit()
+
+    @staticmethod
+    def makeKey(filepath, st, fmt, headersize, swapEndian, invSpec):
+        return (filepath, st.st_size, st.st_mtime_ns, np.dtype(fmt).name,
+                int(headersize), int(swapEndian), int(invSpec))
+
+    def lookup(self, filepaths, fmt=np.int16, headersize=0, swapEndian=False, invSpec=False):
+        """
+        Looks up the cached statistics, with one os.stat per file and without reading any data.
+
+        Returns
+        -------
+        results : list of tuple
+            (size, stats) for each file. size is None if the file does not exist,
+            and stats is None if it isn't cached for the current size, mtime and settings.
+        """
+        results = []
+        for filepath in filepaths:
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                results.append((None, None))
+                continue
+
+            self.cur.execute(
+                "select numSamples, meanAmp, medianAmp, maxAmp, envelope, spectrum from filestats "
+                "where path=? and size=? and mtime=? and fmt=? and headersize=? and swapEndian=? and invSpec=?",
+                self.makeKey(filepath, st, fmt, headersize, swapEndian, invSpec))
+            r = self.cur.fetchone()
+            if r is None:
+                results.append((st.st_size, None))
+            else:
+                results.append((st.st_size, {
+                    'numSamples': r[0],
+                    'meanAmp': r[1],
+                    'medianAmp': r[2],
+                    'maxAmp': r[3],
+                    'envelope': np.frombuffer(r[4], dtype=np.float32),
+                    'spectrum': np.frombuffer(r[5], dtype=np.float32)
+                }))
+
+        return results
+
+    def addStats(self, filepath, st, fmt, headersize, swapEndian, invSpec, stats):
+        # Entries for older versions of the file are no longer useful
+        self.cur.execute("delete from filestats where path=? and (size!=? or mtime!=?)",
+                         (filepath, st.st_size, st.st_mtime_ns))
+        self.cur.execute(
+            "insert or replace into filestats values(?,?,?,?,?,?,?,?,?,?,?,?,?)",
+            self.makeKey(filepath, st, fmt, headersize, swapEndian, invSpec) + (
+                stats['numSamples'], stats['meanAmp'], stats['medianAmp'], stats['maxAmp'],
+                stats['envelope'].astype(np.float32).tobytes(),
+                stats['spectrum'].astype(np.float32).tobytes()))
+        self.con.commit()
+
+    def getOrComputeStats(self, filepath, fmt=np.int16, headersize=0, swapEndian=False, invSpec=False):
+        """
+        Returns the cached statistics, computing and caching them first if needed.
+        Returns None if the file does not exist.
+        """
+        size, stats = self.lookup([filepath], fmt, headersize, swapEndian, invSpec)[0]
+        if size is None or stats is not None:
+            return stats
+
+        # Stat before reading, so a file that changes while being read is recomputed next time
+        st = os.stat(filepath)
+        stats = computeFileStats(filepath, fmt, headersize, swapEndian, invSpec)
+        self.addStats(filepath, st, fmt, headersize, swapEndian, invSpec, stats)
+        return stats
@@ -0,0 +1,36 @@
+import numpy as np
+import os
+import sys
+import glob
+import time
+
+# Compares sequential and parallel reads of the files written by generateTestSamples.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from sampleLoader import readSamples
+
+testdataDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'testdata')
+filepaths = sorted(glob.glob(os.path.join(testdataDir, '*.dat')))
+if len(filepaths) == 0:
+    raise FileNotFoundError("No test data found; run generateTestSamples.py first.")
+
+# Emulate a multi-file capture by repeating the list of files
+numRepeats = 4
+filepaths = filepaths * numRepeats
+print("Reading %d files" % len(filepaths))
+
+# Warm up the page cache once, so that all runs see the same state
+readSamples(filepaths[:len(filepaths)//numRepeats])
+
+reference = None
+for workers in [1, 2, 4, 8]:
+    t1 = time.perf_counter()
+    data, sampleStarts = readSamples(filepaths, workers=workers)
+    t2 = time.perf_counter()
+    print("%d worker(s): %fs, %.1f MSamples/s" % (
+        workers, t2-t1, data.size / (t2-t1) / 1e6))
+
+    # All the runs must read the same samples; only keep a decimated copy to compare
+    if reference is None:
+        reference = data[::4096].copy()
+    assert np.array_equal(data[::4096], reference)
+    del data
@@ -0,0 +1,50 @@
+import numpy as np
+import scipy.signal as sps
+import os
+import sys
+import time
+
+# Compares the batched spectrogram engine against scipy, for complex and real (e.g. .wav) input,
+# across numbers of FFT worker threads
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+from dsp import averagedSpectrogram
+
+fs = 1e8
+nperseg = 128
+noverlap = 16
+window = ('tukey', 0.25)
+length = 1 << 24
+numRuns = 3 # Best of, since other processes get in the way
+
+def bestTime(func):
+    times = []
+    for _ in range(numRuns):
+        t1 = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - t1)
+    return min(times), result
+
+rng = np.random.default_rng(0)
+signals = {
+    'complex': (rng.standard_normal(length) + 1j*rng.standard_normal(length)).astype(np.complex64),
+    'real': rng.standard_normal(length).astype(np.float32),
+}
+print("%d samples, nperseg %d, noverlap %d, %d cores" % (length, nperseg, noverlap, os.cpu_count()))
+
+for name, x in signals.items():
+    onesided = not np.iscomplexobj(x)
+    t, (_, _, ref) = bestTime(lambda: sps.spectrogram(
+        x, fs, window, nperseg, noverlap, nperseg,
+        return_onesided=onesided, detrend=False))
+    print("%s, scipy.signal.spectrogram: %fs, %.1f MSamples/s" % (name, t, x.size / t / 1e6))
+
+    workerCounts = sorted({1, 2, 4, 8, os.cpu_count()})
+    for workers in workerCounts:
+        t, (_, _, sxx, _, _) = bestTime(lambda: averagedSpectrogram(
+            x, fs, window, nperseg, noverlap, 1, workers=workers))
+        print("%s, %d worker(s): %fs, %.1f MSamples/s" % (name, workers, t, x.size / t / 1e6))
+
+        # Must match scipy
+        assert np.allclose(sxx, ref, rtol=1e-3, atol=1e-6 * ref.max())
+        del sxx
+    del ref
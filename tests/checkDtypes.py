@@ -0,0 +1,143 @@
+import numpy as np
+import os
+import sys
+import tracemalloc
+
+# Checks that a representative workflow stays in complex64/float32: each step must return single precision,
+# and must not allocate more (per sample of its input) than its single precision outputs and temporaries.
+# A hidden full-length complex128/float64 copy would add 8-16 bytes per sample on top.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), '..'))
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen') # The analysis windows are created, but never shown
+from PySide6.QtWidgets import QApplication
+from dsp import movingAverages, estimateBaud, makeFreq, makeTimes, stftWindow, segmentPowers
+from pyramid import MinMaxPyramid
+from processingChain import downConvert, DownConvertedArray, overviewSpectrogram
+from fftWindow import FFTWindow
+from estBaudWindow import EstimateBaudWindow
+from cmWindow import EstimateFreqWindow
+from phasorWindow import PhasorWindow
+
+fs = 1e6
+length = 1 << 22 # At least the block/chunk size of every step, so per-block temporaries don't scale with it
+tolerance = 0.5 # Bytes per sample
+
+rng = np.random.default_rng(0)
+def makeSignal(n):
+    return (rng.standard_normal(n) + 1j*rng.standard_normal(n)).astype(np.complex64)
+
+def tracedPeak(func, x):
+    tracemalloc.start()
+    result = func(x)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, result
+
+def bytesPerSample(func):
+    '''Growth of the peak allocation per extra input sample, which excludes anything of a fixed size.'''
+    peak1, _ = tracedPeak(func, makeSignal(length))
+    peak2, result = tracedPeak(func, makeSignal(2 * length))
+    return (peak2 - peak1) / length, result
+
+def dtypesOf(result):
+    if isinstance(result, dict) and 'sxx' in result: # Spectrogram, ignoring the histogram counts
+        return [result[k].dtype for k in ('sxx', 'sxxMax', 'sxxMin') if isinstance(result.get(k), np.ndarray)]
+    if isinstance(result, dict):
+        return [v.dtype for v in result.values()]
+    if isinstance(result, (tuple, list)):
+        return [v.dtype for v in result if isinstance(v, np.ndarray) and v.size > 1]
+    if isinstance(result, MinMaxPyramid):
+        return [level.dtype for level in result.toArrays().values()]
+    return [result.dtype]
+
+def spectrogramPowers(x, nperseg=128, noverlap=16):
+    win, onesided = stftWindow(x, fs, ('tukey',0.25), nperseg, shift=True)
+    return segmentPowers(x, win, nperseg - noverlap, onesided)
+
+app = QApplication.instance() or QApplication([])
+selection = makeSignal(1 << 16)
+freqwin = EstimateFreqWindow(selection, 0, selection.size, fs)
+
+def cyclicMoment(x):
+    freqwin.slicedData = x
+    return freqwin.calculateCM()
+
+# Name -> (step, budget in bytes per input sample, what the budget is made of)
+steps = {
+    'shift, filter and downsample by 2': (
+        lambda x: downConvert(x, fs, 1e4, 64, 1e5, 2), 4, "complex64 output"),
+    'shift only': (
+        lambda x: downConvert(x, fs, 1e4, None, None, None), 8, "complex64 output"),
+    'shift and long filter (overlap-save)': (
+        lambda x: downConvert(x, fs, 1e4, 4096, 1e5, 1), 8, "complex64 output"),
+    'lazy slice, downsample by 3': (
+        lambda x: DownConvertedArray(x, fs, 1e4, None, None, 3)[:], 8/3, "complex64 output"),
+    'lazy slice, filter and every 3rd of downsample by 2': (
+        lambda x: DownConvertedArray(x, fs, 1e4, 64, 1e5, 2)[::3], 8/6, "complex64 output"),
+    'amplitude pyramid': (
+        lambda x: MinMaxPyramid.build(x), 2 * 7*4/64, "7 float32 per 64 samples, and as many again in the levels above"),
+    'overview spectrogram': (
+        lambda x: overviewSpectrogram(x, fs, 0, ('tukey',0.25), 128, 16), 0, "fixed size"),
+    'spectrogram segment powers': (
+        spectrogramPowers, 16 * 128/112, "complex64 windowed frames and their FFT"),
+    'moving averages': (
+        lambda x: movingAverages(x, [100, 1000]), 8, "two float32 outputs"),
+    'baud rate estimate': (
+        lambda x: estimateBaud(x, fs), 36,
+        "float32 |x|, complex64 FFT and its fftshift, float32 |FFT|, frequencies and their fftshift, peak indices"),
+    'frequency vector': (
+        lambda x: makeFreq(x.size, fs), 4, "float32 output"),
+    'cyclic moment (order 2)': (
+        cyclicMoment, 8, "complex64 output"),
+}
+
+print("%d and %d samples" % (length, 2 * length))
+failures = []
+for name, (func, budget, contents) in steps.items():
+    used, result = bytesPerSample(func)
+    dtypes = dtypesOf(result)
+    ok = used <= budget + tolerance and all(dt in (np.complex64, np.float32) for dt in dtypes)
+    print("%s: %.2f bytes/sample (budget %.2f, %s), %s%s" % (
+        name, used, budget, contents, sorted({str(dt) for dt in dtypes}), "" if ok else " FAILED"))
+    if not ok:
+        failures.append(name)
+
+# The spectrogram window and powers, for both complex and real (e.g. .wav) input, even and odd nperseg
+for x in (selection, selection.real.copy()):
+    for nperseg in (128, 127):
+        win, onesided = stftWindow(x, fs, ('tukey',0.25), nperseg, shift=True)
+        power = spectrogramPowers(x, nperseg)
+        ok = win.dtype in (np.complex64, np.float32) and power.dtype == np.float32
+        print("%s spectrogram, nperseg %d: window %s, powers %s%s" % (
+            x.dtype, nperseg, win.dtype, power.dtype, "" if ok else " FAILED"))
+        if not ok:
+            failures.append("%s spectrogram" % (x.dtype))
+
+# The analysis windows, on a selection
+fftwin = FFTWindow(selection, 0, selection.size, fs)
+baudwin = EstimateBaudWindow(selection, 0, selection.size, fs)
+freqwin.slicedData = selection
+phasorwin = PhasorWindow(4)
+phasorwin.updateData(selection[:9], 4)
+windowArrays = {
+    'FFTWindow spectrum': fftwin.fftData,
+    'FFTWindow frequencies': fftwin.fftFreq,
+    'EstimateBaudWindow spectrum': baudwin.datafft,
+    'EstimateFreqWindow spectrum': freqwin.f,
+    'EstimateFreqWindow frequencies': freqwin.ffreq,
+    'PhasorWindow points': phasorwin.data,
+}
+for name, arr in windowArrays.items():
+    ok = arr.dtype in (np.complex64, np.float32)
+    print("%s: %s%s" % (name, arr.dtype, "" if ok else " FAILED"))
+    if not ok:
+        failures.append(name)
+
+# Plot times are float64 on purpose, so that they still increase past 2**24 samples
+times = makeTimes((1 << 24) + 10, 44100)
+ok = np.all(np.diff(times) > 0)
+print("Plot times: %s%s" % (times.dtype, "" if ok else " FAILED"))
+if not ok:
+    failures.append("Plot times")
+
+assert len(failures) == 0, "Promoted past single precision: %s" % (", ".join(failures))
+print("All single precision")
@@ -0,0 +1,43 @@
+import numpy as np
+import os
+import sys
+import time
+
+# Stands in for a recorder: appends complex int16 samples to a file at a fixed rate,
+# so that the Follow mode of the viewer can be tried out on it.
+# Usage: python liveWriter.py [sample rate, default 100e6] [duration in s, default 10]
+fs = float(sys.argv[1]) if len(sys.argv) > 1 else 100e6
+duration = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+
+testdataDir = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'testdata')
+if not os.path.exists(testdataDir):
+    os.makedirs(testdataDir)
+filepath = os.path.join(testdataDir, 'live.dat')
+
+# Noise with a tone that steps in frequency; the blocks (10ms each) are generated up front
+# so that writing them is cheap enough to hold high rates
+blockLen = int(fs / 100)
+numBlocks = 20
+t = np.arange(blockLen) / fs
+blocks = []
+for i in range(numBlocks):
+    freq = (i / numBlocks - 0.5) * fs / 2
+    sig = np.exp(1j*2*np.pi*freq*t) * 1000 + (np.random.randn(blockLen) + 1j*np.random.randn(blockLen)) * 100
+    blocks.append(sig.astype(np.complex64).view(np.float32).astype(np.int16).tobytes())
+
+with open(filepath, 'wb') as fid:
+    t0 = time.perf_counter()
+    written = 0
+    while written < duration * fs:
+        fid.write(blocks[(written // blockLen) % numBlocks])
+        fid.flush()
+        written += blockLen
+
+        # Hold the rate; report if the disk can't keep up
+        lag = time.perf_counter() - t0 - written / fs
+        if lag < 0:
+            time.sleep(-lag)
+        elif lag > 0.5:
+            print("Writer is %.1fs behind" % (lag))
+
+print("Wrote %d samples to %s" % (written, filepath))